@@ -0,0 +1,250 @@
+import math
+import time
+import queue
+import sqlite3
+import threading
+
+ARCHIVE_BATCH_SIZE = 500
+ARCHIVE_FLUSH_INTERVAL = 2.0
+ARCHIVE_QUEUE_SIZE = 50000
+ARCHIVE_RAW_HOURS = 24
+ARCHIVE_SUMMARY_DAYS = 30
+ARCHIVE_RETENTION_INTERVAL = 10 * 60
+
+AFFILIATIONS = ("friendly", "enemy", "unknown")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS observations (
+    ts REAL NOT NULL,
+    icao TEXT NOT NULL,
+    callsign TEXT,
+    altitude REAL,
+    ground_speed REAL,
+    track REAL,
+    lat REAL,
+    lon REAL,
+    vertical_rate REAL,
+    squawk TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_observations_ts ON observations (ts);
+CREATE INDEX IF NOT EXISTS idx_observations_icao_ts ON observations (icao, ts);
+
+CREATE TABLE IF NOT EXISTS observation_minutes (
+    icao TEXT NOT NULL,
+    minute INTEGER NOT NULL,
+    samples INTEGER NOT NULL,
+    callsign TEXT,
+    altitude_min REAL,
+    altitude_max REAL,
+    altitude_avg REAL,
+    ground_speed_avg REAL,
+    lat_avg REAL,
+    lon_avg REAL,
+    PRIMARY KEY (icao, minute)
+);
+CREATE INDEX IF NOT EXISTS idx_observation_minutes_minute ON observation_minutes (minute);
+
+CREATE TABLE IF NOT EXISTS annotations (
+    icao TEXT PRIMARY KEY,
+    affiliation TEXT NOT NULL DEFAULT 'unknown',
+    description TEXT NOT NULL DEFAULT '',
+    updated_at REAL NOT NULL
+);
+"""
+
+OBSERVATION_COLUMNS = ("ts", "icao", "callsign", "altitude", "ground_speed", "track", "lat", "lon", "vertical_rate", "squawk")
+
+def _to_float(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+# === Aircraft Observation Archive ===
+# The ingest thread only ever enqueues. A single writer thread owns the write
+# connection and commits in batches, so SQLite never stalls message parsing.
+class AircraftArchive:
+    def __init__(self, path, raw_hours=ARCHIVE_RAW_HOURS, summary_days=ARCHIVE_SUMMARY_DAYS,
+                 batch_size=ARCHIVE_BATCH_SIZE, flush_interval=ARCHIVE_FLUSH_INTERVAL):
+        self.path = path
+        self.raw_hours = raw_hours
+        self.summary_days = summary_days
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending = queue.Queue(maxsize=ARCHIVE_QUEUE_SIZE)
+        self.dropped = 0
+        self.written = 0
+        self.annotations = {}
+
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        for row in conn.execute("SELECT icao, affiliation, description, updated_at FROM annotations"):
+            self.annotations[row["icao"]] = dict(row)
+        conn.close()
+
+        self._stop = threading.Event()
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        # WAL lets API reads run while the writer thread commits.
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # Called from the ingest thread; never blocks.
+    def record(self, icao, state, ts=None):
+        row = (
+            time.time() if ts is None else ts,
+            icao,
+            state.get("callsign") or None,
+            _to_float(state.get("altitude")),
+            _to_float(state.get("ground_speed")),
+            _to_float(state.get("track")),
+            _to_float(state.get("lat")),
+            _to_float(state.get("lon")),
+            _to_float(state.get("vertical_rate")),
+            state.get("squawk") or None,
+        )
+        try:
+            self.pending.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+
+    def _drain(self, timeout):
+        batch = []
+        try:
+            batch.append(self.pending.get(timeout=timeout))
+            while len(batch) < self.batch_size:
+                batch.append(self.pending.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _write_loop(self):
+        conn = self._connect()
+        last_retention = 0
+        while not self._stop.is_set() or not self.pending.empty():
+            batch = self._drain(self.flush_interval)
+            if batch:
+                try:
+                    with conn:
+                        conn.executemany(
+                            f"INSERT INTO observations ({', '.join(OBSERVATION_COLUMNS)}) "
+                            f"VALUES ({', '.join('?' * len(OBSERVATION_COLUMNS))})",
+                            batch
+                        )
+                    self.written += len(batch)
+                except sqlite3.Error as e:
+                    print(f"[!] Archive write error: {e}")
+            if time.time() - last_retention > ARCHIVE_RETENTION_INTERVAL:
+                try:
+                    self._apply_retention(conn)
+                except sqlite3.Error as e:
+                    print(f"[!] Archive retention error: {e}")
+                last_retention = time.time()
+        conn.close()
+
+    # Roll raw rows older than raw_hours into per-minute summaries, then drop
+    # them. Summaries older than summary_days are dropped too.
+    def _apply_retention(self, conn, now=None):
+        now = time.time() if now is None else now
+        # Cut on a minute boundary so a minute is never summarised in two halves.
+        raw_cutoff = (now - self.raw_hours * 3600) // 60 * 60
+        summary_cutoff = int((now - self.summary_days * 86400) // 60)
+        with conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO observation_minutes
+                    (icao, minute, samples, callsign, altitude_min, altitude_max,
+                     altitude_avg, ground_speed_avg, lat_avg, lon_avg)
+                SELECT icao, CAST(ts / 60 AS INTEGER) AS minute, COUNT(*), MAX(callsign),
+                       MIN(altitude), MAX(altitude), AVG(altitude), AVG(ground_speed),
+                       AVG(lat), AVG(lon)
+                FROM observations
+                WHERE ts < ?
+                GROUP BY icao, minute
+            """, (raw_cutoff,))
+            conn.execute("DELETE FROM observations WHERE ts < ?", (raw_cutoff,))
+            conn.execute("DELETE FROM observation_minutes WHERE minute < ?", (summary_cutoff,))
+
+    # === Queries ===
+    def observations(self, icao=None, since=None, until=None, limit=1000):
+        sql, args = self._range_query("observations", "ts", icao, since, until)
+        sql += " ORDER BY ts DESC LIMIT ?"
+        return self._query(sql, args + [limit])
+
+    def minutes(self, icao=None, since=None, until=None, limit=1000):
+        since = int(since // 60) if since is not None else None
+        until = int(until // 60) if until is not None else None
+        sql, args = self._range_query("observation_minutes", "minute", icao, since, until)
+        sql += " ORDER BY minute DESC LIMIT ?"
+        return self._query(sql, args + [limit])
+
+    def _range_query(self, table, column, icao, since, until):
+        clauses, args = [], []
+        if icao:
+            clauses.append("icao = ?")
+            args.append(icao)
+        if since is not None:
+            clauses.append(f"{column} >= ?")
+            args.append(since)
+        if until is not None:
+            clauses.append(f"{column} <= ?")
+            args.append(until)
+        sql = f"SELECT * FROM {table}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        return sql, args
+
+    def _query(self, sql, args):
+        conn = self._connect()
+        try:
+            return [dict(row) for row in conn.execute(sql, args)]
+        finally:
+            conn.close()
+
+    # === Annotations ===
+    def get_annotation(self, icao):
+        return self.annotations.get(icao)
+
+    def set_annotation(self, icao, affiliation=None, description=None):
+        current = self.annotations.get(icao, {"affiliation": "unknown", "description": ""})
+        affiliation = affiliation or current["affiliation"]
+        if affiliation not in AFFILIATIONS:
+            raise ValueError(f"affiliation must be one of {', '.join(AFFILIATIONS)}")
+        annotation = {
+            "icao": icao,
+            "affiliation": affiliation,
+            "description": current["description"] if description is None else description,
+            "updated_at": time.time(),
+        }
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO annotations (icao, affiliation, description, updated_at) VALUES (?, ?, ?, ?)",
+                    (icao, annotation["affiliation"], annotation["description"], annotation["updated_at"])
+                )
+        finally:
+            conn.close()
+        self.annotations[icao] = annotation
+        return annotation
+
+    def delete_annotation(self, icao):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM annotations WHERE icao = ?", (icao,))
+        finally:
+            conn.close()
+        return self.annotations.pop(icao, None) is not None
+
+    def stats(self):
+        return {"pending": self.pending.qsize(), "written": self.written, "dropped": self.dropped}
+
+    def close(self):
+        self._stop.set()
+        self._writer.join(timeout=self.flush_interval + 5)
@@ -0,0 +1,354 @@
+import time
+import random
+import socket
+import threading
+
+from sbs1 import parse_sbs1_line
+
+FEED_CONNECT_TIMEOUT = 5
+# No data for this long means dump1090 is gone even if the socket looks open.
+# Several times dump1090's 60s SBS heartbeat, so quiet skies don't look stalled.
+FEED_STALL_TIMEOUT = 300
+FEED_BACKOFF_INITIAL = 1.0
+FEED_BACKOFF_MAX = 30.0
+FEED_RATE_WINDOW = 5.0
+# SBS-1 lines are ~150 bytes; a partial line longer than this is not SBS-1.
+FEED_MAX_LINE_BYTES = 4096
+# Receiver clock offsets are re-learned over windows of this length.
+CLOCK_OFFSET_WINDOW = 300.0
+
+# The same message heard by several receivers lands within this window.
+DUPLICATE_WINDOW = 2.0
+DUPLICATE_FIELDS = (
+    "hex_ident", "transmission_type", "callsign", "altitude", "ground_speed",
+    "track", "lat", "lon", "vertical_rate", "squawk",
+)
+
+def _message_time(parsed, received_at):
+    date, clock = parsed.get("generated_date"), parsed.get("generated_time")
+    if date and clock:
+        try:
+            seconds, _, fraction = clock.partition(".")
+            ts = time.mktime(time.strptime(f"{date} {seconds}", "%Y/%m/%d %H:%M:%S"))
+            return ts + (float("0." + fraction) if fraction else 0.0)
+        except ValueError:
+            pass
+    return received_at
+
+# === Single Receiver ===
+# Supervises one dump1090 connection: reconnects with exponential backoff and
+# keeps accurate connection state and message rates.
+class AircraftFeed:
+    def __init__(self, name, host, port, feed_format, manager):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.format = feed_format
+        self.manager = manager
+        self.state = "idle"
+        self.connected = False
+        self.last_error = None
+        self.connected_at = None
+        self.last_message_at = None
+        self.reconnects = 0
+        self.messages = 0
+        self.accepted = 0
+        self.duplicates = 0
+        self.stale = 0
+        self.overlong = 0
+        self.bytes = 0
+        self.rate = 0.0
+        self._rate_start = time.time()
+        self._rate_count = 0
+        self._offset = None
+        self._offset_prev = None
+        self._offset_window_start = time.time()
+        self._stop = threading.Event()
+        self._sock = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        sock = self._sock
+        if sock:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _run(self):
+        backoff = FEED_BACKOFF_INITIAL
+        while not self._stop.is_set():
+            self.state = "connecting"
+            try:
+                with socket.create_connection((self.host, self.port), timeout=FEED_CONNECT_TIMEOUT) as sock:
+                    sock.settimeout(FEED_STALL_TIMEOUT)
+                    self._sock = sock
+                    self.connected = True
+                    self.connected_at = time.time()
+                    self.rate = 0.0
+                    self._rate_start = self.connected_at
+                    self._rate_count = 0
+                    self.state = "connected"
+                    self.last_error = None
+                    print(f"[*] Aircraft feed {self.name} connected to {self.host}:{self.port} ({self.format})")
+                    backoff = FEED_BACKOFF_INITIAL
+                    self._read(sock)
+                    self.last_error = "feed closed"
+            except socket.timeout:
+                self.last_error = f"no data for {FEED_STALL_TIMEOUT}s"
+            except OSError as e:
+                self.last_error = str(e)
+            finally:
+                self._sock = None
+                if self.connected:
+                    print(f"[!] Aircraft feed {self.name} disconnected: {self.last_error}")
+                self.connected = False
+
+            if self._stop.is_set():
+                break
+            self.state = "backoff"
+            self.reconnects += 1
+            # Full jitter keeps several feeds from reconnecting in lockstep.
+            self._stop.wait(random.uniform(backoff / 2, backoff))
+            backoff = min(backoff * 2, FEED_BACKOFF_MAX)
+        self.state = "stopped"
+
+    def _read(self, sock):
+        if self.format == "beast":
+            from beast_decoder import BeastFrameParser, ModeSDecoder
+            parser, decoder = BeastFrameParser(), ModeSDecoder()
+            last_prune = time.time()
+        pending = b""
+        while not self._stop.is_set():
+            data = sock.recv(4096)
+            if not data:
+                return
+            now = time.time()
+            self.bytes += len(data)
+            if self.format == "beast":
+                reports = [decoder.decode(msg, now) for _, _, _, msg in parser.feed(data)]
+                reports = [r for r in reports if r]
+                if now - last_prune > 60:
+                    decoder.prune(now=now)
+                    last_prune = now
+            else:
+                # Carry partial lines across recv() boundaries.
+                lines = (pending + data).split(b"\n")
+                pending = lines.pop()
+                if len(pending) > FEED_MAX_LINE_BYTES:
+                    # No newline in sight (wrong port or format): drop it rather
+                    # than buffer forever.
+                    self.overlong += 1
+                    self.last_error = f"No newline in {len(pending)} bytes, is this an SBS-1 port?"
+                    pending = b""
+                reports = [parse_sbs1_line(line.decode(errors='ignore')) for line in lines]
+                reports = [r for r in reports if r and r.get("hex_ident")]
+            for report in reports:
+                self._count(now)
+                self.manager.submit(self, report, now)
+
+    def _count(self, now):
+        self.messages += 1
+        self.last_message_at = now
+        self._rate_count += 1
+        elapsed = now - self._rate_start
+        if elapsed >= FEED_RATE_WINDOW:
+            self.rate = self._rate_count / elapsed
+            self._rate_start = now
+            self._rate_count = 0
+
+    # Each receiver stamps messages with its own clock (and timezone). The lowest
+    # received - generated gap seen recently is that clock's offset plus the
+    # feed's best-case latency; adding it puts stamps on the server clock, so a
+    # receiver that falls behind its usual latency still shows up as stale.
+    def clock_offset(self, message_time, received_at):
+        sample = received_at - message_time
+        if received_at - self._offset_window_start > CLOCK_OFFSET_WINDOW:
+            self._offset_prev, self._offset = self._offset, None
+            self._offset_window_start = received_at
+        if self._offset is None or sample < self._offset:
+            self._offset = sample
+        return self._offset if self._offset_prev is None else min(self._offset, self._offset_prev)
+
+    def info(self, now=None):
+        now = time.time() if now is None else now
+        rate = self.rate
+        if not rate and now - self._rate_start >= 1:
+            rate = self._rate_count / (now - self._rate_start)  # First window since connecting.
+        if not self.connected or self.last_message_at is None or now - self.last_message_at > 2 * FEED_RATE_WINDOW:
+            rate = 0.0
+        return {
+            "name": self.name,
+            "host": self.host,
+            "port": self.port,
+            "format": self.format,
+            "state": self.state,
+            "connected": self.connected,
+            "last_error": self.last_error,
+            "connected_at": self.connected_at,
+            "last_message_at": self.last_message_at,
+            "reconnects": self.reconnects,
+            "messages": self.messages,
+            "accepted": self.accepted,
+            "duplicates": self.duplicates,
+            "stale_positions": self.stale,
+            "overlong_lines": self.overlong,
+            "bytes": self.bytes,
+            "msg_rate": round(rate, 2),
+            "clock_offset": None if self._offset is None else round(self._offset, 3),
+        }
+
+# === Feed Manager ===
+# Merges reports from every feed into one stream for on_report(parsed):
+#   - identical messages heard by several receivers are passed on once
+#   - a position older than the last accepted one for that ICAO is dropped,
+#     so a lagging receiver can't move an aircraft backwards (message times
+#     are first corrected for each receiver's clock offset)
+class AircraftFeedManager:
+    def __init__(self, on_report):
+        self.on_report = on_report
+        self.feeds = {}
+        self.recent = {}
+        self.last_position = {}
+        self._lock = threading.Lock()
+        self._last_prune = time.time()
+
+    def add_feed(self, name, host, port, feed_format="sbs1"):
+        if feed_format not in ("sbs1", "beast"):
+            raise ValueError(f"Unknown aircraft feed format: {feed_format}")
+        feed = AircraftFeed(name, host, int(port), feed_format, self)
+        self.feeds[name] = feed
+        feed.start()
+        return feed
+
+    def submit(self, feed, parsed, received_at):
+        key = tuple(parsed.get(k) for k in DUPLICATE_FIELDS)
+        with self._lock:
+            seen = self.recent.get(key)
+            if seen is not None and received_at - seen < DUPLICATE_WINDOW:
+                feed.duplicates += 1
+                return
+            self.recent[key] = received_at
+
+            icao = parsed["hex_ident"]
+            if parsed.get("lat") and parsed.get("lon"):
+                message_time = _message_time(parsed, received_at)
+                message_time += feed.clock_offset(message_time, received_at)
+                if message_time < self.last_position.get(icao, 0):
+                    feed.stale += 1
+                    return
+                self.last_position[icao] = message_time
+
+            feed.accepted += 1
+            try:
+                self.on_report(parsed)
+            except Exception as e:
+                print(f"[!] Aircraft report handler error ({feed.name}): {e}")
+
+            if received_at - self._last_prune > DUPLICATE_WINDOW * 5:
+                self._prune(received_at)
+
+    def _prune(self, now):
+        self.recent = {k: t for k, t in self.recent.items() if now - t < DUPLICATE_WINDOW}
+        self.last_position = {k: t for k, t in self.last_position.items() if now - t < 3600}
+        self._last_prune = now
+
+    def any_connected(self):
+        return any(feed.connected for feed in self.feeds.values())
+
+    def stats(self):
+        now = time.time()
+        return [feed.info(now) for feed in self.feeds.values()]
+
+    def stop(self):
+        for feed in self.feeds.values():
+            feed.stop()
+
+# === Fake Feeds ===
+# Local SBS-1 servers for exercising reconnects and merging without dump1090.
+class FakeSBS1Feed:
+    def __init__(self, port, aircraft, rate=50, host="127.0.0.1"):
+        self.host = host
+        self.port = port
+        self.aircraft = aircraft
+        self.rate = rate
+        self._server = None
+        self._stop = threading.Event()
+
+    def start(self):
+        self._stop.clear()
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((self.host, self.port))
+        self._server.listen()
+        threading.Thread(target=self._accept_loop, args=(self._server,), daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        if self._server:
+            self._server.close()
+            self._server = None
+
+    def _accept_loop(self, server):
+        while not self._stop.is_set():
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        i = 0
+        with conn:
+            while not self._stop.is_set():
+                icao = self.aircraft[i % len(self.aircraft)]
+                lat = 35.0 + (i % 1000) * 0.001
+                stamp = time.strftime("%Y/%m/%d,%H:%M:%S.000")
+                line = f"MSG,3,1,1,{icao},1,{stamp},{stamp},,12000,,,{lat:.5f},-100.00000,,,,,,0\r\n"
+                try:
+                    conn.sendall(line.encode())
+                except OSError:
+                    return
+                i += 1
+                time.sleep(1.0 / self.rate)
+
+def demo():
+    global FEED_BACKOFF_INITIAL
+    FEED_BACKOFF_INITIAL = 0.5
+
+    merged = {}
+    manager = AircraftFeedManager(lambda parsed: merged.setdefault(parsed["hex_ident"], 0))
+    feed_a = FakeSBS1Feed(40003, ["AAA001", "AAA002", "SHARED"])
+    feed_b = FakeSBS1Feed(40004, ["BBB001", "SHARED"])
+    feed_a.start()
+    feed_b.start()
+    manager.add_feed("a", "127.0.0.1", 40003)
+    manager.add_feed("b", "127.0.0.1", 40004)
+    manager.add_feed("missing", "127.0.0.1", 40005)
+
+    def show(label):
+        print(f"--- {label}")
+        for info in manager.stats():
+            print(f"{info['name']:8} {info['state']:10} connected={info['connected']!s:5} "
+                  f"rate={info['msg_rate']:6.1f}/s accepted={info['accepted']:5} dup={info['duplicates']:4} "
+                  f"reconnects={info['reconnects']} error={info['last_error']}")
+
+    time.sleep(6)
+    show("both feeds up")
+    feed_b.stop()
+    time.sleep(2)
+    show("feed b stopped")
+    feed_b.start()
+    time.sleep(6)
+    show("feed b restarted")
+    print(f"Aircraft merged: {sorted(merged)}")
+    manager.stop()
+    feed_a.stop()
+    feed_b.stop()
+
+if __name__ == '__main__':
+    demo()
@@ -0,0 +1,154 @@
+import math
+import time
+import threading
+from array import array
+
+TRACK_HISTORY_SIZE = 512
+TRACK_EXPIRE_SECONDS = 30 * 60
+MAX_DEAD_RECKON_SECONDS = 60
+
+EARTH_RADIUS_M = 6371008.8
+KNOTS_TO_MPS = 0.514444
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+def _clean(value):
+    return None if math.isnan(value) else value
+
+# === Dead Reckoning ===
+# Flat-earth projection from the last fix. Good enough for the tens of seconds
+# between sparse MSG,3 position reports.
+def dead_reckon(lat, lon, alt, ground_speed, track, vertical_rate, dt):
+    if math.isnan(ground_speed) or math.isnan(track) or dt <= 0:
+        return lat, lon, alt
+    distance = ground_speed * KNOTS_TO_MPS * dt
+    heading = math.radians(track)
+    dlat = distance * math.cos(heading) / EARTH_RADIUS_M
+    dlon = distance * math.sin(heading) / (EARTH_RADIUS_M * max(math.cos(math.radians(lat)), 1e-6))
+    new_alt = alt
+    if not math.isnan(alt) and not math.isnan(vertical_rate):
+        new_alt = alt + vertical_rate * dt / 60.0
+    return lat + math.degrees(dlat), ((lon + math.degrees(dlon) + 540.0) % 360.0) - 180.0, new_alt
+
+# === Per-Aircraft Ring Buffer ===
+# Fixed-size columns of doubles, preallocated once per aircraft. Missing values
+# are stored as NaN and come back out as None.
+class TrackHistory:
+    COLUMNS = ("ts", "lat", "lon", "altitude", "ground_speed", "track", "vertical_rate")
+
+    def __init__(self, size=TRACK_HISTORY_SIZE):
+        self.size = size
+        self.head = 0
+        self.count = 0
+        for name in self.COLUMNS:
+            setattr(self, name, array('d', [math.nan]) * size)
+
+    def append(self, ts, lat, lon, altitude, ground_speed, track, vertical_rate):
+        i = self.head
+        self.ts[i] = ts
+        self.lat[i] = lat
+        self.lon[i] = lon
+        self.altitude[i] = altitude
+        self.ground_speed[i] = ground_speed
+        self.track[i] = track
+        self.vertical_rate[i] = vertical_rate
+        self.head = (i + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+
+    def last_index(self):
+        return (self.head - 1) % self.size if self.count else None
+
+    def last_ts(self):
+        i = self.last_index()
+        return None if i is None else self.ts[i]
+
+    # Physical indexes oldest -> newest.
+    def _indexes(self):
+        start = (self.head - self.count) % self.size
+        return [(start + k) % self.size for k in range(self.count)]
+
+    def points(self, since=None, max_points=None):
+        indexes = self._indexes()
+        if since is not None:
+            indexes = [i for i in indexes if self.ts[i] >= since]
+        if max_points and len(indexes) > max_points:
+            step = math.ceil(len(indexes) / max_points)
+            # Keep the newest fix even when it doesn't fall on the stride.
+            indexes = indexes[::-1][::step][::-1]
+        return [
+            {name: _clean(getattr(self, name)[i]) for name in self.COLUMNS}
+            for i in indexes
+        ]
+
+    def predict(self, now=None):
+        i = self.last_index()
+        if i is None:
+            return None
+        now = time.time() if now is None else now
+        dt = min(now - self.ts[i], MAX_DEAD_RECKON_SECONDS)
+        lat, lon, alt = dead_reckon(
+            self.lat[i], self.lon[i], self.altitude[i],
+            self.ground_speed[i], self.track[i], self.vertical_rate[i], dt
+        )
+        return {"ts": now, "lat": lat, "lon": lon, "altitude": _clean(alt), "age": round(now - self.ts[i], 3)}
+
+# === Track Store ===
+class TrackStore:
+    def __init__(self, size=TRACK_HISTORY_SIZE, expire_seconds=TRACK_EXPIRE_SECONDS):
+        self.size = size
+        self.expire_seconds = expire_seconds
+        self.tracks = {}
+        self._lock = threading.Lock()
+
+    # Called with the merged aircraft state after each SBS-1 update. Only
+    # messages that carry a position create a fix; velocity comes from the
+    # most recent MSG,4 already merged into the state.
+    def record(self, icao, state, ts=None):
+        lat = _to_float(state.get("lat"))
+        lon = _to_float(state.get("lon"))
+        if math.isnan(lat) or math.isnan(lon):
+            return False
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            history = self.tracks.get(icao)
+            if history is None:
+                history = self.tracks[icao] = TrackHistory(self.size)
+            history.append(
+                ts, lat, lon,
+                _to_float(state.get("altitude")),
+                _to_float(state.get("ground_speed")),
+                _to_float(state.get("track")),
+                _to_float(state.get("vertical_rate")),
+            )
+        return True
+
+    def trail(self, icao, window=None, max_points=None, now=None):
+        now = time.time() if now is None else now
+        since = now - window if window else None
+        with self._lock:
+            history = self.tracks.get(icao)
+            if history is None:
+                return None
+            return {
+                "icao": icao,
+                "points": history.points(since, max_points),
+                "predicted": history.predict(now),
+            }
+
+    def predict(self, icao, now=None):
+        with self._lock:
+            history = self.tracks.get(icao)
+            return history.predict(now) if history else None
+
+    def prune(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            stale = [icao for icao, h in self.tracks.items() if now - (h.last_ts() or 0) > self.expire_seconds]
+            for icao in stale:
+                del self.tracks[icao]
+        return len(stale)
@@ -111,13 +111,26 @@ function setupMap() {
 	}
 
 	// Set the base map layer.
-	L.tileLayer("https://{s}.basemaps.cartocdn.com/dark_all/{z}/{x}/{y}{r}.png", {
+	const baseLayer = L.tileLayer("https://{s}.basemaps.cartocdn.com/dark_all/{z}/{x}/{y}{r}.png", {
 		//L.tileLayer("https://server.arcgisonline.com/ArcGIS/rest/services/Canvas/World_Dark_Gray_Base/MapServer/tile/{z}/{y}/{x}", {
 		minZoom: 6,
 		maxZoom: 19,
 		attribution: 'Map data © <a href="https://www.cartocdn.com/">cartocdn</a> contributors',
 	}).addTo(map);
 
+	// Use the backend tile cache when it is running: local tiles work offline and
+	// tiles ahead of the vehicle are prefetched from GPS. The tile service answers
+	// 503 until it has started, so keep asking for a while.
+	const useBackendTiles = (attempt = 0) => {
+		fetch("/api/tiles/stats")
+			.then((res) => {
+				if (res.ok) baseLayer.setUrl("/tiles/{z}/{x}/{y}.png");
+				else if (res.status === 503 && attempt < 60) setTimeout(() => useBackendTiles(attempt + 1), 1000);
+			})
+			.catch(() => {});
+	};
+	useBackendTiles();
+
 	// When the map is dragged, stop following the user location.
 	window.map.on("dragstart", () => {
 		if (isFollowingUserLocation) {
@@ -3,6 +3,12 @@ export let isFollowingUserLocation = false;
 const MARKERS_STORAGE_KEY = "custom_map_markers";
 let customMarkers = [];
 
+// When the backend marker store is available only the visible viewport is
+// loaded, already clustered for the current zoom. Otherwise markers live in localStorage.
+let markerServer = false;
+let clusterMarkers = [];
+let viewportRequest = 0;
+
 /* ───── Storage ───── */
 function loadMarkersFromStorage() {
 	return JSON.parse(localStorage.getItem(MARKERS_STORAGE_KEY) || "[]");
@@ -13,6 +19,123 @@ function saveMarkersToStorage() {
 	localStorage.setItem(MARKERS_STORAGE_KEY, JSON.stringify(plainMarkers));
 }
 
+/* ───── Server Markers ───── */
+function viewportBbox() {
+	const bounds = window.map.getBounds();
+	let west = bounds.getWest();
+	let east = bounds.getEast();
+	if (east - west >= 360) {
+		west = -180;
+		east = 180;
+	} else {
+		const wrap = (lng) => ((((lng + 180) % 360) + 360) % 360) - 180;
+		west = wrap(west);
+		east = wrap(east);
+	}
+	const south = Math.max(bounds.getSouth(), -85);
+	const north = Math.min(bounds.getNorth(), 85);
+	return [west, south, east, north].map((v) => v.toFixed(6)).join(",");
+}
+
+function clearRenderedMarkers() {
+	customMarkers.forEach((m) => m._leafletMarker && window.map.removeLayer(m._leafletMarker));
+	clusterMarkers.forEach((m) => window.map.removeLayer(m));
+	customMarkers = [];
+	clusterMarkers = [];
+}
+
+function createClusterMarker(cluster) {
+	const size = cluster.count < 100 ? 30 : cluster.count < 1000 ? 36 : 44;
+	const iconHtml = `
+		<div style="width:${size}px;height:${size}px;border-radius:50%;background:rgba(33,150,243,0.85);border:2px solid #222;color:#fff;display:flex;align-items:center;justify-content:center;font-size:12px;font-weight:bold;">
+			${cluster.count}
+		</div>`;
+	const icon = L.divIcon({ className: "", html: iconHtml, iconSize: [size, size], iconAnchor: [size / 2, size / 2] });
+	const marker = L.marker([cluster.lat, cluster.lng], { icon }).addTo(window.map);
+	marker.on("click", () => window.map.setView([cluster.lat, cluster.lng], cluster.expansion_zoom));
+	clusterMarkers.push(marker);
+}
+
+async function loadViewportMarkers() {
+	const request = ++viewportRequest;
+	try {
+		const res = await fetch(`/api/markers?bbox=${viewportBbox()}&zoom=${window.map.getZoom()}`);
+		if (!res.ok) return;
+		const items = await res.json();
+		if (request !== viewportRequest) return; // A newer viewport is already loading.
+		clearRenderedMarkers();
+		items.forEach((item) => (item.cluster ? createClusterMarker(item) : createCustomMarker(item)));
+	} catch (err) {
+		console.error("Failed to load markers:", err);
+	}
+}
+
+async function saveMarker(markerData) {
+	if (!markerServer) {
+		createCustomMarker(markerData);
+		return;
+	}
+	try {
+		const res = await fetch("/api/markers", {
+			method: "POST",
+			headers: { "Content-Type": "application/json" },
+			body: JSON.stringify(markerData),
+		});
+		if (!res.ok) throw new Error((await res.json()).error);
+		createCustomMarker(await res.json());
+	} catch (err) {
+		console.error("Failed to save marker:", err);
+	}
+}
+
+// Move markers saved before the backend store existed onto the server once.
+async function migrateStoredMarkers() {
+	const stored = loadMarkersFromStorage();
+	if (!stored.length) return;
+	const res = await fetch("/api/markers", {
+		method: "POST",
+		headers: { "Content-Type": "application/json" },
+		body: JSON.stringify(stored),
+	});
+	if (res.ok) localStorage.removeItem(MARKERS_STORAGE_KEY);
+}
+
+// Answers 503 while the backend is still starting its services.
+const MARKER_SERVER_RETRIES = 60;
+const MARKER_SERVER_RETRY_MS = 1000;
+
+async function initMarkers() {
+	// Show stored markers right away; they move to the server once it is ready.
+	customMarkers = loadMarkersFromStorage();
+	customMarkers.forEach((data) => {
+		createCustomMarker(data); // this now also pushes back into customMarkers with _leafletMarker
+	});
+
+	for (let attempt = 0; attempt < MARKER_SERVER_RETRIES; attempt++) {
+		let status = 0;
+		try {
+			status = (await fetch("/api/markers/stats")).status;
+		} catch {
+			return; // No backend: stay in localStorage mode.
+		}
+		if (status === 200) {
+			markerServer = true;
+			break;
+		}
+		if (status !== 503) return;
+		await new Promise((resolve) => setTimeout(resolve, MARKER_SERVER_RETRY_MS));
+	}
+	if (!markerServer) return;
+
+	try {
+		await migrateStoredMarkers();
+	} catch (err) {
+		console.error("Failed to migrate stored markers:", err);
+	}
+	window.map.on("moveend", loadViewportMarkers);
+	loadViewportMarkers();
+}
+
 /* ───── Create Marker ───── */
 function createCustomMarker(markerData) {
 	const iconHtml = `
@@ -39,7 +162,7 @@ function createCustomMarker(markerData) {
 	} else {
 		customMarkers.push({ ...markerData, _leafletMarker: marker });
 	}
-	saveMarkersToStorage();
+	if (!markerServer) saveMarkersToStorage();
 	return marker;
 }
 
@@ -137,7 +260,7 @@ function openMarkerModal(markerData = null) {
 				window.map.removeLayer(existing._leafletMarker);
 			}
 		}
-		createCustomMarker(data);
+		saveMarker(data);
 		bootstrap.Modal.getInstance(modal).hide();
 	};
 
@@ -178,12 +301,15 @@ function enableModalDragging(modal) {
 
 /* ───── Delete Marker ───── */
 function deleteMarker(id) {
+	if (markerServer) {
+		fetch(`/api/markers/${encodeURIComponent(id)}`, { method: "DELETE" }).catch((err) => console.error("Failed to delete marker:", err));
+	}
 	const idx = customMarkers.findIndex((m) => m.id === id);
 	if (idx !== -1) {
 		const marker = customMarkers[idx]._leafletMarker;
 		if (marker) window.map.removeLayer(marker);
 		customMarkers.splice(idx, 1);
-		saveMarkersToStorage();
+		if (!markerServer) saveMarkersToStorage();
 	}
 }
 
@@ -305,10 +431,7 @@ export function addButtonToToolbar(buttonId, iconHtml, tooltipText, onClick) {
 
 /* ───── Init ───── */
 window.addEventListener("DOMContentLoaded", () => {
-	customMarkers = loadMarkersFromStorage();
-	customMarkers.forEach((data) => {
-		createCustomMarker(data); // this now also pushes back into customMarkers with _leafletMarker
-	});
+	initMarkers();
 
 	// Add marker on long click (hold for 600ms)
 	let longClickTimer = null;
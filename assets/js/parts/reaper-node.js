@@ -28,7 +28,8 @@ export function initializeReaperNodeSocket() {
 	reaperNodeSocket.on("reaper_node_received", (data) => {
 		const now = new Date();
 		const timestamp = now.toLocaleTimeString();
-		reaper_log.textContent += `[${timestamp}] ${data.line}\n`;
+		const nodeTag = data.node_id ? `[${data.node_id}] ` : "";
+		reaper_log.textContent += `[${timestamp}] ${nodeTag}${data.line}\n`;
 		reaper_log.scrollTop = reaper_log.scrollHeight;
 
 		const lineObj = { line: data.line, timestamp: now.toISOString() };
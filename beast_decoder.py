@@ -0,0 +1,454 @@
+import math
+import time
+import bisect
+
+# === Beast Binary Protocol (dump1090 port 30005) ===
+# Frame: 0x1A <type> <6 byte MLAT timestamp> <1 byte signal> <payload>
+# Any 0x1A inside a frame is sent twice, so a lone 0x1A always starts a frame.
+BEAST_ESCAPE = 0x1A
+BEAST_PAYLOAD_LENGTHS = {
+    0x31: 2,   # '1' Mode-A/C
+    0x32: 7,   # '2' Mode-S short
+    0x33: 14,  # '3' Mode-S long
+}
+BEAST_HEADER_LENGTH = 7  # timestamp + signal
+
+# Keep the even/odd CPR pair usable for global decoding for this long.
+CPR_PAIR_MAX_AGE = 10.0
+# A previous position can seed local CPR decoding for this long.
+CPR_LOCAL_MAX_AGE = 30.0
+
+CALLSIGN_CHARSET = "#ABCDEFGHIJKLMNOPQRSTUVWXYZ##### ###############0123456789######"
+
+# === Mode-S CRC ===
+MODES_GENERATOR = 0xFFF409
+
+def _build_crc_table():
+    table = []
+    for i in range(256):
+        crc = i << 16
+        for _ in range(8):
+            crc = (crc << 1) ^ MODES_GENERATOR if crc & 0x800000 else crc << 1
+        table.append(crc & 0xFFFFFF)
+    return table
+
+CRC_TABLE = _build_crc_table()
+
+def modes_crc(data):
+    crc = 0
+    for b in data:
+        crc = ((crc << 8) & 0xFFFFFF) ^ CRC_TABLE[((crc >> 16) ^ b) & 0xFF]
+    return crc
+
+# Remainder of the full message: 0 for a clean DF11/17/18, the ICAO address
+# for address/parity replies (DF0/4/5/16/20/21).
+def modes_checksum(msg):
+    return modes_crc(msg[:-3]) ^ int.from_bytes(msg[-3:], 'big')
+
+# === Frame Parser ===
+class BeastFrameParser:
+    def __init__(self):
+        self.buffer = bytearray()
+        self.frames = 0
+        self.resyncs = 0
+
+    # Feed raw socket bytes, returns a list of (type, mlat, signal, message).
+    def feed(self, data):
+        buf = self.buffer
+        buf += data
+        frames = []
+        pos = 0
+        end = len(buf)
+        while True:
+            start = buf.find(BEAST_ESCAPE, pos)
+            if start < 0:
+                pos = end
+                break
+            if start + 1 >= end:
+                pos = start
+                break
+            frame_type = buf[start + 1]
+            payload_len = BEAST_PAYLOAD_LENGTHS.get(frame_type)
+            if payload_len is None:
+                # Escaped 0x1A or an unsupported frame (status etc.): resync.
+                pos = start + (2 if frame_type == BEAST_ESCAPE else 1)
+                if frame_type != BEAST_ESCAPE:
+                    self.resyncs += 1
+                continue
+
+            need = BEAST_HEADER_LENGTH + payload_len
+            body_start = start + 2
+            chunk = buf[body_start:body_start + need]
+            if len(chunk) == need and BEAST_ESCAPE not in chunk:
+                # Fast path: nothing escaped in this frame.
+                body = bytes(chunk)
+                next_pos = body_start + need
+            else:
+                body, next_pos = self._unescape(buf, body_start, need, end)
+                if body is None:
+                    if next_pos is None:
+                        pos = start
+                        break
+                    self.resyncs += 1
+                    pos = next_pos
+                    continue
+
+            frames.append((frame_type, int.from_bytes(body[0:6], 'big'), body[6], body[7:]))
+            pos = next_pos
+        del buf[:pos]
+        self.frames += len(frames)
+        return frames
+
+    # Slow path. Returns (body, next_pos); (None, None) if the frame is
+    # incomplete and (None, pos) if a lone 0x1A cut the frame short.
+    def _unescape(self, buf, j, need, end):
+        out = bytearray()
+        while len(out) < need:
+            if j >= end:
+                return None, None
+            b = buf[j]
+            if b == BEAST_ESCAPE:
+                if j + 1 >= end:
+                    return None, None
+                if buf[j + 1] != BEAST_ESCAPE:
+                    return None, j
+                j += 2
+            else:
+                j += 1
+            out.append(b)
+        return bytes(out), j
+
+def beast_escape(data):
+    return data.replace(b'\x1a', b'\x1a\x1a')
+
+def encode_beast_frame(msg, mlat=0, signal=0xFF):
+    frame_type = 0x33 if len(msg) == 14 else 0x32
+    body = mlat.to_bytes(6, 'big') + bytes([signal]) + msg
+    return bytes([BEAST_ESCAPE, frame_type]) + beast_escape(body)
+
+# === CPR Position Decoding ===
+CPR_NZ = 15
+CPR_SCALE = 131072.0  # 2^17
+
+# Latitudes where NL steps down, ascending. NL(lat) is then a bisect instead
+# of an acos per call.
+def _build_nl_table():
+    a = 1 - math.cos(math.pi / (2 * CPR_NZ))
+    return sorted(
+        math.degrees(math.acos(math.sqrt(a / (1 - math.cos(2 * math.pi / nl)))))
+        for nl in range(2, 4 * CPR_NZ)
+    )
+
+CPR_NL_TABLE = _build_nl_table()
+
+def cpr_nl(lat):
+    return len(CPR_NL_TABLE) + 1 - bisect.bisect_left(CPR_NL_TABLE, abs(lat))
+
+def cpr_global(even, odd, newest_odd):
+    lat_e, lon_e = even[0] / CPR_SCALE, even[1] / CPR_SCALE
+    lat_o, lon_o = odd[0] / CPR_SCALE, odd[1] / CPR_SCALE
+    j = math.floor(59 * lat_e - 60 * lat_o + 0.5)
+    rlat_e = (360.0 / 60) * (j % 60 + lat_e)
+    rlat_o = (360.0 / 59) * (j % 59 + lat_o)
+    if rlat_e >= 270:
+        rlat_e -= 360
+    if rlat_o >= 270:
+        rlat_o -= 360
+    if cpr_nl(rlat_e) != cpr_nl(rlat_o):
+        return None  # Pair straddles a longitude zone boundary.
+    lat = rlat_o if newest_odd else rlat_e
+    nl = cpr_nl(lat)
+    ni = max(nl - 1 if newest_odd else nl, 1)
+    m = math.floor(lon_e * (nl - 1) - lon_o * nl + 0.5)
+    lon = (360.0 / ni) * (m % ni + (lon_o if newest_odd else lon_e))
+    if lon >= 180:
+        lon -= 360
+    return lat, lon
+
+def cpr_local(cpr, odd, ref_lat, ref_lon):
+    lat_c, lon_c = cpr[0] / CPR_SCALE, cpr[1] / CPR_SCALE
+    dlat = 360.0 / (60 - odd)
+    j = math.floor(ref_lat / dlat) + math.floor(0.5 + (ref_lat % dlat) / dlat - lat_c)
+    lat = dlat * (j + lat_c)
+    dlon = 360.0 / max(cpr_nl(lat) - odd, 1)
+    m = math.floor(ref_lon / dlon) + math.floor(0.5 + (ref_lon % dlon) / dlon - lon_c)
+    lon = dlon * (m + lon_c)
+    return lat, lon
+
+def cpr_encode(lat, lon, odd):
+    dlat = 360.0 / (60 - odd)
+    yz = math.floor(CPR_SCALE * (lat % dlat) / dlat + 0.5)
+    rlat = dlat * (yz / CPR_SCALE + math.floor(lat / dlat))
+    dlon = 360.0 / max(cpr_nl(rlat) - odd, 1)
+    xz = math.floor(CPR_SCALE * (lon % dlon) / dlon + 0.5)
+    return int(yz) & 0x1FFFF, int(xz) & 0x1FFFF
+
+# === Field Decoders ===
+def _bits(value, total, first, last):
+    return (value >> (total - last)) & ((1 << (last - first + 1)) - 1)
+
+def decode_callsign(me):
+    chars = [CALLSIGN_CHARSET[(me >> (42 - 6 * i)) & 0x3F] for i in range(8)]
+    return "".join(chars).replace("#", "").strip()
+
+# 12-bit altitude from airborne position messages (25 ft steps only).
+def decode_ac12(alt):
+    if not alt & 0x10:
+        return None  # Gillham coded 100 ft steps, not decoded.
+    n = ((alt & 0xFE0) >> 1) | (alt & 0x0F)
+    return n * 25 - 1000
+
+# 13-bit altitude code from DF0/4/16/20 surveillance replies.
+def decode_ac13(ac):
+    if ac & 0x40 or not ac & 0x10:
+        return None  # Metric or Gillham coded.
+    n = ((ac & 0x1F80) >> 2) | ((ac & 0x20) >> 1) | (ac & 0x0F)
+    return n * 25 - 1000
+
+def decode_squawk(ident):
+    c1, a1, c2, a2, c4, a4 = [(ident >> s) & 1 for s in (12, 11, 10, 9, 8, 7)]
+    b1, d1, b2, d2, b4, d4 = [(ident >> s) & 1 for s in (5, 4, 3, 2, 1, 0)]
+    a = a4 * 4 + a2 * 2 + a1
+    b = b4 * 4 + b2 * 2 + b1
+    c = c4 * 4 + c2 * 2 + c1
+    d = d4 * 4 + d2 * 2 + d1
+    return f"{a}{b}{c}{d}"
+
+def decode_velocity(me):
+    subtype = _bits(me, 56, 6, 8)
+    vr_raw = _bits(me, 56, 38, 46)
+    vertical_rate = None
+    if vr_raw:
+        vertical_rate = (vr_raw - 1) * 64 * (-1 if _bits(me, 56, 37, 37) else 1)
+    if subtype not in (1, 2):
+        return None, None, vertical_rate  # Airspeed/heading subtypes.
+    vew = _bits(me, 56, 15, 24)
+    vns = _bits(me, 56, 26, 35)
+    if not vew or not vns:
+        return None, None, vertical_rate
+    scale = 4 if subtype == 2 else 1
+    vx = (vew - 1) * scale * (-1 if _bits(me, 56, 14, 14) else 1)
+    vy = (vns - 1) * scale * (-1 if _bits(me, 56, 25, 25) else 1)
+    speed = math.hypot(vx, vy)
+    track = math.degrees(math.atan2(vx, vy)) % 360.0
+    return speed, track, vertical_rate
+
+# === Mode-S Message Decoder ===
+# Turns Mode-S messages into reports keyed like SBS-1 fields so they merge
+# into the same aircraft state as the BaseStation path.
+class ModeSDecoder:
+    def __init__(self):
+        self.cpr = {}
+        self.known_icaos = set()
+        self.decoded = 0
+        self.crc_errors = 0
+
+    def _report(self, icao, transmission_type):
+        return {"message_type": "MSG", "transmission_type": transmission_type, "hex_ident": icao}
+
+    def decode(self, msg, now=None):
+        if len(msg) < 7:
+            return None
+        now = time.time() if now is None else now
+        df = msg[0] >> 3
+        if df in (17, 18):
+            if len(msg) != 14 or modes_checksum(msg) != 0:
+                self.crc_errors += 1
+                return None
+            icao = msg[1:4].hex().upper()
+            self.known_icaos.add(icao)
+            report = self._decode_extended(icao, int.from_bytes(msg[4:11], 'big'), now)
+        elif df in (4, 5, 20, 21):
+            # Address/parity: only trust addresses already seen in a clean DF17.
+            icao = f"{modes_checksum(msg):06X}"
+            if icao not in self.known_icaos:
+                return None
+            field = int.from_bytes(msg[2:4], 'big') & 0x1FFF
+            if df in (4, 20):
+                altitude = decode_ac13(field)
+                if altitude is None:
+                    return None
+                report = self._report(icao, "5")
+                report["altitude"] = str(altitude)
+            else:
+                report = self._report(icao, "6")
+                report["squawk"] = decode_squawk(field)
+        else:
+            return None
+        if report:
+            self.decoded += 1
+        return report
+
+    def _decode_extended(self, icao, me, now):
+        tc = me >> 51
+        if 1 <= tc <= 4:
+            report = self._report(icao, "1")
+            report["callsign"] = decode_callsign(me)
+            return report
+        if 9 <= tc <= 18 or 20 <= tc <= 22:
+            report = self._report(icao, "3")
+            if tc <= 18:
+                altitude = decode_ac12(_bits(me, 56, 9, 20))
+                if altitude is not None:
+                    report["altitude"] = str(altitude)
+            position = self._decode_position(icao, me, now)
+            if position:
+                report["lat"] = f"{position[0]:.5f}"
+                report["lon"] = f"{position[1]:.5f}"
+            return report
+        if tc == 19:
+            speed, track, vertical_rate = decode_velocity(me)
+            report = self._report(icao, "4")
+            if speed is not None:
+                report["ground_speed"] = str(round(speed))
+                report["track"] = f"{track:.1f}"
+            if vertical_rate is not None:
+                report["vertical_rate"] = str(vertical_rate)
+            return report
+        return None
+
+    def _decode_position(self, icao, me, now):
+        odd = _bits(me, 56, 22, 22)
+        cpr = (_bits(me, 56, 23, 39), _bits(me, 56, 40, 56))
+        state = self.cpr.setdefault(icao, {})
+        state[odd] = (cpr, now)
+
+        position = None
+        other = state.get(1 - odd)
+        if other and now - other[1] <= CPR_PAIR_MAX_AGE:
+            even_cpr = cpr if odd == 0 else other[0]
+            odd_cpr = cpr if odd == 1 else other[0]
+            position = cpr_global(even_cpr, odd_cpr, odd == 1)
+        if position is None:
+            last = state.get("pos")
+            if last and now - last[2] <= CPR_LOCAL_MAX_AGE:
+                position = cpr_local(cpr, odd, last[0], last[1])
+        if position:
+            state["pos"] = (position[0], position[1], now)
+        return position
+
+    def prune(self, max_age=300, now=None):
+        now = time.time() if now is None else now
+        for icao in list(self.cpr):
+            times = [v[-1] for v in self.cpr[icao].values()]
+            if not times or now - max(times) > max_age:
+                del self.cpr[icao]
+
+# === Benchmark ===
+# Encoders used to build synthetic traffic when no capture is supplied.
+def _with_crc(body):
+    return body + modes_crc(body).to_bytes(3, 'big')
+
+def encode_identification(icao, callsign):
+    me = 4 << 51
+    padded = callsign.upper().ljust(8)[:8]
+    for i, ch in enumerate(padded):
+        me |= CALLSIGN_CHARSET.index(ch) << (42 - 6 * i)
+    return _with_crc(bytes([0x8D]) + icao + me.to_bytes(7, 'big'))
+
+def encode_position(icao, lat, lon, altitude, odd):
+    n = (altitude + 1000) // 25
+    alt12 = ((n & 0x7F0) << 1) | 0x10 | (n & 0x0F)
+    yz, xz = cpr_encode(lat, lon, odd)
+    me = (11 << 51) | (alt12 << 36) | (odd << 34) | (yz << 17) | xz
+    return _with_crc(bytes([0x8D]) + icao + me.to_bytes(7, 'big'))
+
+def encode_velocity(icao, speed, track, vertical_rate):
+    vx = speed * math.sin(math.radians(track))
+    vy = speed * math.cos(math.radians(track))
+    vr = abs(vertical_rate) // 64 + 1
+    me = (19 << 51) | (1 << 48)
+    me |= (1 if vx < 0 else 0) << 42 | (int(round(abs(vx))) + 1) << 32
+    me |= (1 if vy < 0 else 0) << 31 | (int(round(abs(vy))) + 1) << 21
+    me |= (1 if vertical_rate < 0 else 0) << 19 | vr << 10
+    return _with_crc(bytes([0x8D]) + icao + me.to_bytes(7, 'big'))
+
+def _sbs_line(icao, tt, callsign="", altitude="", speed="", track="", lat="", lon="", vr=""):
+    stamp = "2025/01/01,12:00:00.000"
+    return (f"MSG,{tt},1,1,{icao},1,{stamp},{stamp},{callsign},{altitude},{speed},"
+            f"{track},{lat},{lon},{vr},,,,,0")
+
+def generate_traffic(aircraft=200, rounds=50):
+    beast = bytearray()
+    sbs = []
+    for a in range(aircraft):
+        icao = (0x400000 + a * 7919).to_bytes(3, 'big')
+        hex_icao = icao.hex().upper()
+        lat, lon = 35.0 + (a % 40) * 0.1, -100.0 + (a // 40) * 0.1
+        altitude, speed, track = 10000 + (a % 30) * 1000, 250 + a % 200, (a * 37) % 360
+        callsign = f"RN{a:04d}"
+        for r in range(rounds):
+            lat_r = lat + r * 0.001
+            if r % 10 == 0:
+                beast += encode_beast_frame(encode_identification(icao, callsign))
+                sbs.append(_sbs_line(hex_icao, 1, callsign=callsign))
+            beast += encode_beast_frame(encode_position(icao, lat_r, lon, altitude, r % 2))
+            sbs.append(_sbs_line(hex_icao, 3, altitude=altitude, lat=f"{lat_r:.5f}", lon=f"{lon:.5f}"))
+            beast += encode_beast_frame(encode_velocity(icao, speed, track, 640))
+            sbs.append(_sbs_line(hex_icao, 4, speed=speed, track=track, vr=640))
+    return bytes(beast), ("\r\n".join(sbs) + "\r\n").encode()
+
+def _chunks(data, size=4096):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+def benchmark(beast_data=None, sbs_data=None, repeat=3):
+    from sbs1 import parse_sbs1_line, merge_aircraft_update
+
+    if beast_data is None or sbs_data is None:
+        beast_data, sbs_data = generate_traffic()
+    beast_chunks = _chunks(beast_data)
+    sbs_chunks = _chunks(sbs_data)
+
+    def run_sbs():
+        aircraft = {}
+        count = 0
+        pending = b""
+        for chunk in sbs_chunks:
+            # Carry partial lines across recv() boundaries.
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                line = line.decode(errors='ignore')
+                parsed = parse_sbs1_line(line)
+                if parsed and merge_aircraft_update(aircraft, parsed)[0]:
+                    count += 1
+        return count, aircraft
+
+    def run_beast():
+        aircraft = {}
+        parser = BeastFrameParser()
+        decoder = ModeSDecoder()
+        count = 0
+        for chunk in beast_chunks:
+            for _, _, _, msg in parser.feed(chunk):
+                report = decoder.decode(msg)
+                if report and merge_aircraft_update(aircraft, report)[0]:
+                    count += 1
+        return count, aircraft
+
+    print(f"SBS-1 input: {len(sbs_data):,} bytes | Beast input: {len(beast_data):,} bytes")
+    for label, fn, size in (("SBS-1", run_sbs, len(sbs_data)), ("Beast", run_beast, len(beast_data))):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            count, aircraft = fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{label:6} {count:>8,} msgs  {len(aircraft):>5} aircraft  "
+              f"{count / best:>12,.0f} msg/s  {size / best / 1e6:>7.2f} MB/s")
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark Beast vs SBS-1 ingest on the same traffic.")
+    parser.add_argument('--beast', help="Recorded Beast capture (e.g. nc 127.0.0.1 30005 > beast.bin)")
+    parser.add_argument('--sbs', help="Recorded SBS-1 capture (e.g. nc 127.0.0.1 30003 > sbs.txt)")
+    args = parser.parse_args()
+
+    beast_data = sbs_data = None
+    if args.beast and args.sbs:
+        with open(args.beast, 'rb') as f:
+            beast_data = f.read()
+        with open(args.sbs, 'rb') as f:
+            sbs_data = f.read()
+    benchmark(beast_data, sbs_data)
@@ -1,16 +1,13 @@
 import os
 import requests
-from math import log, tan, pi, cos
+import sys
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 import time
 
-def deg2num(lat_deg, lon_deg, zoom):
-    lat_rad = lat_deg * pi / 180
-    n = 2.0 ** zoom
-    x_tile = int((lon_deg + 180.0) / 360.0 * n)
-    y_tile = int((1.0 - log(tan(lat_rad) + 1 / cos(lat_rad)) / pi) / 2.0 * n)
-    return x_tile, y_tile
+# Shared tile math lives in the repo root.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tile_math import tile_count, iter_tile_range
 
 def fetch_tile(z, x, y, url_template, save_dir, api_key, headers, max_retries=3):
     url = url_template.format(z=z, x=x, y=y, key=api_key)
@@ -40,28 +37,21 @@ def download_tiles(zoom_levels, lat_min, lat_max, lon_min, lon_max, url_template
         'User-Agent': 'Mozilla/5.0 (compatible; TileScraper/1.0; +https://yourdomain.com)'
     }
 
-    tile_tasks = []
-
-    for z in zoom_levels:
-        x_start, y_start = deg2num(lat_max, lon_min, z)
-        x_end, y_end = deg2num(lat_min, lon_max, z)
-        for x in range(x_start, x_end + 1):
-            for y in range(y_start, y_end + 1):
-                tile_tasks.append((z, x, y))
-
-    total = len(tile_tasks)
+    total = tile_count(lat_min, lon_min, lat_max, lon_max, zoom_levels)
 
     with ThreadPoolExecutor(max_workers=thread_count) as executor:
-        futures = []
         progress = tqdm(total=total, desc="Downloading tiles", unit="tile")
 
-        for z, x, y in tile_tasks:
-            future = executor.submit(fetch_tile, z, x, y, url_template, save_dir, api_key, headers)
-            futures.append(future)
-
-        for future in as_completed(futures):
-            future.result()  # This will raise errors if fetch_tile failed critically
-            progress.update(1)
+        # Submit one chunk of the region at a time instead of holding a task
+        # tuple and future for every tile in it.
+        for z, xs, ys in iter_tile_range(lat_min, lon_min, lat_max, lon_max, zoom_levels):
+            futures = [
+                executor.submit(fetch_tile, z, x, y, url_template, save_dir, api_key, headers)
+                for x, y in zip(xs.tolist(), ys.tolist())
+            ]
+            for future in as_completed(futures):
+                future.result()  # This will raise errors if fetch_tile failed critically
+                progress.update(1)
 
         progress.close()
 
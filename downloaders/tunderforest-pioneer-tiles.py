@@ -1,13 +1,10 @@
 import os
 import requests
-from math import log, tan, pi, cos
+import sys
 
-def deg2num(lat_deg, lon_deg, zoom):
-    lat_rad = lat_deg * pi / 180
-    n = 2.0 ** zoom
-    x_tile = int((lon_deg + 180.0) / 360.0 * n)
-    y_tile = int((1.0 - log(tan(lat_rad) + 1 / cos(lat_rad)) / pi) / 2.0 * n)
-    return x_tile, y_tile
+# Shared tile math lives in the repo root.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tile_math import deg2num
 
 def download_tiles(zoom_levels, lat_min, lat_max, lon_min, lon_max, url_template, save_dir, api_key):
     headers = {
@@ -0,0 +1,411 @@
+import math
+import json
+import time
+import uuid
+import threading
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = 111320.0
+
+GEOFENCE_CELL_DEG = 0.1
+PROXIMITY_CELL_DEG = 0.05
+# Fences spanning more cells than this are checked on every update instead.
+GEOFENCE_MAX_CELLS = 400
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+def point_in_polygon(lat, lon, points):
+    inside = False
+    j = len(points) - 1
+    for i in range(len(points)):
+        lat_i, lon_i = points[i]
+        lat_j, lon_j = points[j]
+        if (lat_i > lat) != (lat_j > lat):
+            cross = (lon_j - lon_i) * (lat - lat_i) / (lat_j - lat_i) + lon_i
+            if lon < cross:
+                inside = not inside
+        j = i
+    return inside
+
+def _cell(lat, lon, size):
+    return int(math.floor(lat / size)), int(math.floor(lon / size))
+
+def _bbox_cell_range(bbox, size):
+    lat_min, lon_min, lat_max, lon_max = bbox
+    y0, x0 = _cell(lat_min, lon_min, size)
+    y1, x1 = _cell(lat_max, lon_max, size)
+    return y0, x0, y1, x1
+
+def _bbox_cell_count(bbox, size):
+    y0, x0, y1, x1 = _bbox_cell_range(bbox, size)
+    return (y1 - y0 + 1) * (x1 - x0 + 1)
+
+def _bbox_cells(bbox, size):
+    y0, x0, y1, x1 = _bbox_cell_range(bbox, size)
+    return [(y, x) for y in range(y0, y1 + 1) for x in range(x0, x1 + 1)]
+
+# Validate an API/config dict into a fence with a precomputed bounding box.
+def build_fence(data):
+    fence_type = data.get("type")
+    fence = {
+        "id": str(data.get("id") or uuid.uuid4().hex[:8]),
+        "type": fence_type,
+        "name": data.get("name", ""),
+        "kinds": list(data.get("kinds") or []),
+    }
+    if fence_type == "circle":
+        lat, lon, radius = float(data["lat"]), float(data["lon"]), float(data["radius_m"])
+        if radius <= 0:
+            raise ValueError("radius_m must be positive")
+        dlat = radius / METERS_PER_DEGREE
+        dlon = radius / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+        fence.update({"lat": lat, "lon": lon, "radius_m": radius})
+        fence["bbox"] = (lat - dlat, lon - dlon, lat + dlat, lon + dlon)
+    elif fence_type == "polygon":
+        points = [(float(p[0]), float(p[1])) for p in data["points"]]
+        if len(points) < 3:
+            raise ValueError("polygon needs at least 3 points")
+        fence["points"] = points
+        lats = [p[0] for p in points]
+        lons = [p[1] for p in points]
+        fence["bbox"] = (min(lats), min(lons), max(lats), max(lons))
+    else:
+        raise ValueError("type must be 'circle' or 'polygon'")
+    return fence
+
+def build_rule(data):
+    kinds = data.get("kinds") or ["node", "node"]
+    if len(kinds) != 2:
+        raise ValueError("kinds must name two target kinds, e.g. ['node', 'aircraft']")
+    distance = float(data["distance_m"])
+    if distance <= 0:
+        raise ValueError("distance_m must be positive")
+    return {
+        "id": str(data.get("id") or uuid.uuid4().hex[:8]),
+        "name": data.get("name", ""),
+        "kinds": [str(kinds[0]), str(kinds[1])],
+        "distance_m": distance,
+    }
+
+def fence_contains(fence, lat, lon):
+    lat_min, lon_min, lat_max, lon_max = fence["bbox"]
+    if lat < lat_min or lat > lat_max or lon < lon_min or lon > lon_max:
+        return False
+    if fence["type"] == "circle":
+        return haversine_m(lat, lon, fence["lat"], fence["lon"]) <= fence["radius_m"]
+    return point_in_polygon(lat, lon, fence["points"])
+
+# === Geofence + Proximity Engine ===
+# Targets (nodes, aircraft) are evaluated incrementally as their positions
+# arrive. Fences and targets live in uniform lat/lon grids so an update only
+# looks at fences covering its cell and targets in nearby cells.
+class GeofenceEngine:
+    def __init__(self, cell_deg=GEOFENCE_CELL_DEG, proximity_cell_deg=PROXIMITY_CELL_DEG):
+        self.cell_deg = cell_deg
+        self.proximity_cell_deg = proximity_cell_deg
+        self.fences = {}
+        self.fence_cells = {}
+        self.large_fences = set()
+        self.rules = {}
+        self.targets = {}
+        self.target_cells = {}
+        self.inside = {}
+        self.near = {}
+        self._lock = threading.RLock()
+
+    # === Configuration ===
+    def add_fence(self, data):
+        fence = build_fence(data)
+        with self._lock:
+            self.remove_fence(fence["id"])
+            self.fences[fence["id"]] = fence
+            # Count first: a continent-sized fence must not build its cell list.
+            if _bbox_cell_count(fence["bbox"], self.cell_deg) > GEOFENCE_MAX_CELLS:
+                self.large_fences.add(fence["id"])
+            else:
+                for cell in _bbox_cells(fence["bbox"], self.cell_deg):
+                    self.fence_cells.setdefault(cell, set()).add(fence["id"])
+        return fence
+
+    def remove_fence(self, fence_id):
+        with self._lock:
+            fence = self.fences.pop(fence_id, None)
+            if not fence:
+                return False
+            if fence_id in self.large_fences:
+                self.large_fences.discard(fence_id)
+            else:
+                for cell in _bbox_cells(fence["bbox"], self.cell_deg):
+                    ids = self.fence_cells.get(cell)
+                    if ids:
+                        ids.discard(fence_id)
+                        if not ids:
+                            del self.fence_cells[cell]
+            for fences in self.inside.values():
+                fences.discard(fence_id)
+        return True
+
+    def add_rule(self, data):
+        rule = build_rule(data)
+        with self._lock:
+            self.remove_rule(rule["id"])
+            self.rules[rule["id"]] = rule
+        return rule
+
+    def remove_rule(self, rule_id):
+        with self._lock:
+            if self.rules.pop(rule_id, None) is None:
+                return False
+            for pairs in self.near.values():
+                for key in [k for k in pairs if k[0] == rule_id]:
+                    del pairs[key]
+        return True
+
+    # === Updates ===
+    def update_target(self, target_id, kind, lat, lon, ts=None):
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            previous = self.targets.get(target_id)
+            if previous:
+                old_cell = _cell(previous["lat"], previous["lon"], self.proximity_cell_deg)
+            else:
+                old_cell = None
+            target = {"id": target_id, "kind": kind, "lat": lat, "lon": lon, "ts": ts}
+            self.targets[target_id] = target
+            new_cell = _cell(lat, lon, self.proximity_cell_deg)
+            if old_cell != new_cell:
+                if old_cell is not None:
+                    self._unindex_target(target_id, old_cell)
+                self.target_cells.setdefault(new_cell, set()).add(target_id)
+
+            events = self._update_fences(target)
+            events += self._update_proximity(target)
+        return events
+
+    def remove_target(self, target_id, ts=None):
+        ts = time.time() if ts is None else ts
+        events = []
+        with self._lock:
+            target = self.targets.pop(target_id, None)
+            if not target:
+                return events
+            self._unindex_target(target_id, _cell(target["lat"], target["lon"], self.proximity_cell_deg))
+            for fence_id in self.inside.pop(target_id, set()):
+                events.append(self._fence_event("fence_exit", self.fences[fence_id], target, ts))
+            for (rule_id, other_id), distance in self.near.pop(target_id, {}).items():
+                self.near.get(other_id, {}).pop((rule_id, target_id), None)
+                events.append(self._proximity_event("proximity_exit", rule_id, target_id, other_id, None, ts))
+        return events
+
+    def prune_targets(self, max_age, now=None):
+        now = time.time() if now is None else now
+        events = []
+        with self._lock:
+            stale = [tid for tid, t in self.targets.items() if now - t["ts"] > max_age]
+            for target_id in stale:
+                events += self.remove_target(target_id, now)
+        return events
+
+    def _unindex_target(self, target_id, cell):
+        ids = self.target_cells.get(cell)
+        if ids:
+            ids.discard(target_id)
+            if not ids:
+                del self.target_cells[cell]
+
+    def _candidate_fences(self, lat, lon):
+        ids = self.fence_cells.get(_cell(lat, lon, self.cell_deg))
+        if not self.large_fences:
+            return ids or ()
+        return (ids or set()) | self.large_fences
+
+    def _update_fences(self, target):
+        target_id, lat, lon = target["id"], target["lat"], target["lon"]
+        now_inside = set()
+        for fence_id in self._candidate_fences(lat, lon):
+            fence = self.fences[fence_id]
+            if fence["kinds"] and target["kind"] not in fence["kinds"]:
+                continue
+            if fence_contains(fence, lat, lon):
+                now_inside.add(fence_id)
+
+        was_inside = self.inside.get(target_id, set())
+        if not now_inside and not was_inside:
+            return []
+        events = []
+        for fence_id in now_inside - was_inside:
+            events.append(self._fence_event("fence_enter", self.fences[fence_id], target, target["ts"]))
+        for fence_id in was_inside - now_inside:
+            if fence_id in self.fences:
+                events.append(self._fence_event("fence_exit", self.fences[fence_id], target, target["ts"]))
+        if now_inside:
+            self.inside[target_id] = now_inside
+        else:
+            self.inside.pop(target_id, None)
+        return events
+
+    def _update_proximity(self, target):
+        target_id, kind = target["id"], target["kind"]
+        rules = [r for r in self.rules.values() if kind in r["kinds"]]
+        was_near = self.near.get(target_id, {})
+        if not rules and not was_near:
+            return []
+
+        now_near = {}
+        lat, lon = target["lat"], target["lon"]
+        cy, cx = _cell(lat, lon, self.proximity_cell_deg)
+        for rule in rules:
+            a_kind, b_kind = rule["kinds"]
+            other_kind = b_kind if kind == a_kind else a_kind
+            distance = rule["distance_m"]
+            reach_y = math.ceil(distance / METERS_PER_DEGREE / self.proximity_cell_deg)
+            reach_x = math.ceil(distance / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6)) / self.proximity_cell_deg)
+            for y in range(cy - reach_y, cy + reach_y + 1):
+                for x in range(cx - reach_x, cx + reach_x + 1):
+                    for other_id in self.target_cells.get((y, x), ()):
+                        if other_id == target_id:
+                            continue
+                        other = self.targets[other_id]
+                        if other["kind"] != other_kind:
+                            continue
+                        d = haversine_m(lat, lon, other["lat"], other["lon"])
+                        if d <= distance:
+                            now_near[(rule["id"], other_id)] = d
+
+        events = []
+        for key, d in now_near.items():
+            if key not in was_near:
+                rule_id, other_id = key
+                self.near.setdefault(other_id, {})[(rule_id, target_id)] = d
+                events.append(self._proximity_event("proximity_enter", rule_id, target_id, other_id, d, target["ts"]))
+        for key in was_near:
+            if key not in now_near:
+                rule_id, other_id = key
+                self.near.get(other_id, {}).pop((rule_id, target_id), None)
+                events.append(self._proximity_event("proximity_exit", rule_id, target_id, other_id, None, target["ts"]))
+        if now_near:
+            self.near[target_id] = now_near
+        else:
+            self.near.pop(target_id, None)
+        return events
+
+    def _fence_event(self, event_type, fence, target, ts):
+        return {
+            "type": event_type,
+            "fence_id": fence["id"],
+            "fence_name": fence["name"],
+            "target_id": target["id"],
+            "kind": target["kind"],
+            "lat": target["lat"],
+            "lon": target["lon"],
+            "ts": ts,
+        }
+
+    def _proximity_event(self, event_type, rule_id, target_id, other_id, distance, ts):
+        rule = self.rules.get(rule_id, {})
+        return {
+            "type": event_type,
+            "rule_id": rule_id,
+            "rule_name": rule.get("name", ""),
+            "targets": [target_id, other_id],
+            "distance_m": None if distance is None else round(distance, 1),
+            "ts": ts,
+        }
+
+    # === State / Persistence ===
+    def state(self):
+        with self._lock:
+            return {
+                "inside": {tid: sorted(fences) for tid, fences in self.inside.items()},
+                "near": {tid: [{"rule_id": r, "target_id": o, "distance_m": round(d, 1)} for (r, o), d in pairs.items()]
+                         for tid, pairs in self.near.items() if pairs},
+            }
+
+    def config(self):
+        with self._lock:
+            fences = [{k: v for k, v in f.items() if k != "bbox"} for f in self.fences.values()]
+            return {"fences": fences, "rules": list(self.rules.values())}
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.config(), f, indent=2)
+
+    def load(self, path):
+        try:
+            with open(path) as f:
+                config = json.load(f)
+        except FileNotFoundError:
+            return
+        for fence in config.get("fences", []):
+            self.add_fence(fence)
+        for rule in config.get("rules", []):
+            self.add_rule(rule)
+
+# === Benchmark ===
+def benchmark(fence_count=5000, target_count=5000, updates=50000):
+    import random
+
+    rng = random.Random(42)
+    region = (34.0, -106.0, 38.0, -100.0)
+
+    def random_point():
+        return rng.uniform(region[0], region[2]), rng.uniform(region[1], region[3])
+
+    engine = GeofenceEngine()
+    start = time.perf_counter()
+    for i in range(fence_count):
+        lat, lon = random_point()
+        if i % 2:
+            engine.add_fence({"type": "circle", "lat": lat, "lon": lon, "radius_m": rng.uniform(200, 5000)})
+        else:
+            size = rng.uniform(0.005, 0.05)
+            engine.add_fence({"type": "polygon", "points": [
+                (lat, lon), (lat + size, lon + size / 3), (lat + size / 2, lon + size), (lat - size / 4, lon + size / 2)
+            ]})
+    engine.add_rule({"kinds": ["node", "node"], "distance_m": 2000})
+    engine.add_rule({"kinds": ["node", "aircraft"], "distance_m": 10000})
+    print(f"Indexed {fence_count:,} fences in {time.perf_counter() - start:.2f}s")
+
+    positions = {}
+    for i in range(target_count):
+        kind = "node" if i % 10 == 0 else "aircraft"
+        positions[f"{kind}:{i}"] = [kind, *random_point()]
+
+    moves = []
+    ids = list(positions)
+    for _ in range(updates):
+        tid = rng.choice(ids)
+        p = positions[tid]
+        p[1] = min(max(p[1] + rng.uniform(-0.01, 0.01), region[0]), region[2])
+        p[2] = min(max(p[2] + rng.uniform(-0.01, 0.01), region[1]), region[3])
+        moves.append((tid, p[0], p[1], p[2]))
+
+    start = time.perf_counter()
+    events = 0
+    for tid, kind, lat, lon in moves:
+        events += len(engine.update_target(tid, kind, lat, lon))
+    elapsed = time.perf_counter() - start
+    print(f"Indexed:     {updates:,} updates in {elapsed:.2f}s = {updates / elapsed:,.0f} updates/s, {events:,} events")
+
+    # Baseline: every update scans every fence and every other target.
+    sample = moves[:max(updates // 50, 1)]
+    fences = list(engine.fences.values())
+    latest = {}
+    start = time.perf_counter()
+    for tid, kind, lat, lon in sample:
+        latest[tid] = (kind, lat, lon)
+        for fence in fences:
+            fence_contains(fence, lat, lon)
+        for other_id, (other_kind, olat, olon) in latest.items():
+            if other_id != tid:
+                haversine_m(lat, lon, olat, olon)
+    elapsed = time.perf_counter() - start
+    print(f"Brute force: {len(sample):,} updates in {elapsed:.2f}s = {len(sample) / elapsed:,.0f} updates/s (partial target set)")
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,346 @@
+import math
+import time
+import sqlite3
+import threading
+
+MARKER_FIELDS = ("id", "name", "type", "color", "lat", "lng", "description")
+
+CLUSTER_RADIUS_PX = 60
+CLUSTER_TILE_SIZE = 256
+CLUSTER_MIN_ZOOM = 0
+# Above this zoom every marker is returned individually.
+CLUSTER_MAX_ZOOM = 16
+# Largest viewport (per axis, in screen pixels at the requested zoom) a query may cover.
+MAX_VIEWPORT_PX = 16384
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS markers (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL DEFAULT '',
+    type TEXT NOT NULL DEFAULT '',
+    color TEXT NOT NULL DEFAULT '',
+    lat REAL NOT NULL,
+    lng REAL NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    updated_at REAL NOT NULL
+);
+"""
+
+# === Web Mercator (0..1 world units) ===
+def lng_to_x(lng):
+    return lng / 360.0 + 0.5
+
+def lat_to_y(lat):
+    s = math.sin(math.radians(max(min(lat, 85.05112878), -85.05112878)))
+    return 0.5 - 0.25 * math.log((1 + s) / (1 - s)) / math.pi
+
+def x_to_lng(x):
+    return (x - 0.5) * 360.0
+
+def y_to_lat(y):
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+
+def clean_marker(data):
+    marker = {k: data.get(k) for k in MARKER_FIELDS}
+    if not marker["id"]:
+        raise ValueError("marker id is required")
+    marker["id"] = str(marker["id"])
+    marker["lat"] = float(marker["lat"])
+    marker["lng"] = float(marker["lng"])
+    if not (-90 <= marker["lat"] <= 90 and -180 <= marker["lng"] <= 180):
+        raise ValueError("marker position out of range")
+    for key in ("name", "type", "color", "description"):
+        marker[key] = str(marker[key] or "")
+    return marker
+
+# === Cluster Level ===
+# Parallel lists of points at one zoom, plus a grid for bbox lookups. refs[i]
+# is the marker index for a single marker and -1 for a cluster.
+class ClusterLevel:
+    def __init__(self, zoom, xs, ys, counts, refs, cell):
+        self.zoom = zoom
+        self.xs = xs
+        self.ys = ys
+        self.counts = counts
+        self.refs = refs
+        self.cell = cell
+        self.grid = _build_grid(xs, ys, cell)
+
+    # Walks the cells inside the box, or only the occupied cells when there are
+    # fewer of those, so cost never exceeds the size of the level.
+    def query(self, x0, y0, x1, y1):
+        cell = self.cell
+        cx0, cx1, cy0, cy1 = int(x0 / cell), int(x1 / cell), int(y0 / cell), int(y1 / cell)
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) <= len(self.grid):
+            cells = (self.grid.get((cx, cy), ()) for cy in range(cy0, cy1 + 1) for cx in range(cx0, cx1 + 1))
+        else:
+            cells = (items for (cx, cy), items in self.grid.items() if cx0 <= cx <= cx1 and cy0 <= cy <= cy1)
+        found = []
+        for items in cells:
+            for i in items:
+                if x0 <= self.xs[i] <= x1 and y0 <= self.ys[i] <= y1:
+                    found.append(i)
+        return found
+
+def _build_grid(xs, ys, cell):
+    grid = {}
+    for i in range(len(xs)):
+        grid.setdefault((int(xs[i] / cell), int(ys[i] / cell)), []).append(i)
+    return grid
+
+def _radius(zoom):
+    return CLUSTER_RADIUS_PX / (CLUSTER_TILE_SIZE * 2 ** zoom)
+
+# Greedy radius clustering of the level below, same scheme as supercluster:
+# each unvisited point absorbs its unvisited neighbours within the radius into
+# a count-weighted centroid.
+def _cluster_level(prev, zoom):
+    r = _radius(zoom)
+    r2 = r * r
+    xs, ys, counts, refs = prev.xs, prev.ys, prev.counts, prev.refs
+    grid = _build_grid(xs, ys, r)
+    visited = bytearray(len(xs))
+    out_x, out_y, out_c, out_r = [], [], [], []
+    for i in range(len(xs)):
+        if visited[i]:
+            continue
+        visited[i] = 1
+        x, y, c = xs[i], ys[i], counts[i]
+        cx, cy = int(x / r), int(y / r)
+        wx, wy, total = x * c, y * c, c
+        for gy in (cy - 1, cy, cy + 1):
+            for gx in (cx - 1, cx, cx + 1):
+                for j in grid.get((gx, gy), ()):
+                    if visited[j]:
+                        continue
+                    dx, dy = xs[j] - x, ys[j] - y
+                    if dx * dx + dy * dy <= r2:
+                        visited[j] = 1
+                        wx += xs[j] * counts[j]
+                        wy += ys[j] * counts[j]
+                        total += counts[j]
+        if total == c:
+            out_x.append(x)
+            out_y.append(y)
+            out_c.append(c)
+            out_r.append(refs[i])
+        else:
+            out_x.append(wx / total)
+            out_y.append(wy / total)
+            out_c.append(total)
+            out_r.append(-1)
+    return ClusterLevel(zoom, out_x, out_y, out_c, out_r, r)
+
+# === Marker Store ===
+# Markers persist one row at a time in SQLite. The cluster index is built on
+# the first viewport query; after that edits trigger a rebuild in a background
+# thread and queries keep using the previous index until it is swapped in.
+# Only one builder runs at a time, so indexes are installed in snapshot order.
+class MarkerStore:
+    def __init__(self, path, min_zoom=CLUSTER_MIN_ZOOM, max_zoom=CLUSTER_MAX_ZOOM):
+        self.path = path
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.markers = {}
+        self.levels = None
+        self.indexed = []
+        self._dirty = True
+        self._building = False
+        self._lock = threading.Lock()
+        self._built = threading.Condition(self._lock)
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        for row in conn.execute(f"SELECT {', '.join(MARKER_FIELDS)} FROM markers"):
+            self.markers[row["id"]] = dict(row)
+        conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10) if self.path else sqlite3.connect(":memory:")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _persist(self, upserts=(), deletes=()):
+        if not self.path:
+            return
+        conn = self._connect()
+        try:
+            with conn:
+                now = time.time()
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO markers ({', '.join(MARKER_FIELDS)}, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [tuple(m[k] for k in MARKER_FIELDS) + (now,) for m in upserts]
+                )
+                conn.executemany("DELETE FROM markers WHERE id = ?", [(i,) for i in deletes])
+        finally:
+            conn.close()
+
+    def upsert(self, items):
+        markers = [clean_marker(item) for item in items]
+        with self._lock:
+            self._persist(upserts=markers)
+            for marker in markers:
+                self.markers[marker["id"]] = marker
+            self._mark_dirty()
+        return markers
+
+    def delete(self, marker_id):
+        with self._lock:
+            if self.markers.pop(marker_id, None) is None:
+                return False
+            self._persist(deletes=[marker_id])
+            self._mark_dirty()
+        return True
+
+    def all(self):
+        with self._lock:
+            return list(self.markers.values())
+
+    # Caller holds the lock.
+    def _start_builder(self):
+        if not self._building:
+            self._building = True
+            threading.Thread(target=self._build_loop, daemon=True).start()
+
+    # Caller holds the lock. Before the first index exists the running builder
+    # (or the first query) picks the edit up.
+    def _mark_dirty(self):
+        self._dirty = True
+        if self.levels is not None:
+            self._start_builder()
+
+    # The only place an index is built. Edits made during a build set _dirty
+    # again, so the loop builds once more from the newer snapshot.
+    def _build_loop(self):
+        try:
+            while True:
+                with self._lock:
+                    if not self._dirty:
+                        self._building = False
+                        self._built.notify_all()
+                        return
+                    indexed = list(self.markers.values())
+                    self._dirty = False
+                levels = self._build_levels(indexed)
+                with self._lock:
+                    self.indexed = indexed
+                    self.levels = levels
+                    self._built.notify_all()
+        except Exception as e:
+            print(f"[!] Marker index build failed: {e}")
+            with self._lock:
+                self._dirty = True
+                self._building = False
+                self._built.notify_all()
+
+    def _build_levels(self, indexed):
+        xs = [lng_to_x(m["lng"]) for m in indexed]
+        ys = [lat_to_y(m["lat"]) for m in indexed]
+        level = ClusterLevel(self.max_zoom + 1, xs, ys, [1] * len(indexed), list(range(len(indexed))), _radius(self.max_zoom + 1))
+        levels = {self.max_zoom + 1: level}
+        for zoom in range(self.max_zoom, self.min_zoom - 1, -1):
+            level = _cluster_level(level, zoom)
+            levels[zoom] = level
+        return levels
+
+    # Waits for an index that includes every edit made before the call.
+    def build(self):
+        with self._lock:
+            if self._dirty or self.levels is None:
+                self._start_builder()
+            while self._building:
+                self._built.wait()
+            if self.levels is None:
+                raise RuntimeError("Marker index build failed")
+            return self.indexed, self.levels
+
+    def info(self):
+        with self._lock:
+            return {
+                "markers": len(self.markers),
+                "indexed": len(self.indexed),
+                "rebuilding": self._building,
+                "levels": {z: len(level.xs) for z, level in sorted(self.levels.items())} if self.levels else {},
+            }
+
+    # Clusters and markers inside a viewport at a map zoom. Raises ValueError
+    # for a viewport much larger than any screen at that zoom.
+    def query(self, west, south, east, north, zoom):
+        with self._lock:
+            if self.levels is None:
+                self._start_builder()
+                while self.levels is None and self._building:
+                    self._built.wait()
+                if self.levels is None:
+                    raise RuntimeError("Marker index build failed")
+            indexed, levels = self.indexed, self.levels
+        zoom = min(max(int(zoom), self.min_zoom), self.max_zoom + 1)
+        level = levels[zoom]
+        west, east = min(max(west, -180.0), 180.0), min(max(east, -180.0), 180.0)
+        y0, y1 = lat_to_y(north), lat_to_y(south)
+        if west <= east:
+            ranges = [(lng_to_x(west), lng_to_x(east))]
+        else:
+            ranges = [(lng_to_x(west), 1.0), (0.0, lng_to_x(east))]  # Crosses the antimeridian.
+
+        world_px = CLUSTER_TILE_SIZE * 2 ** zoom
+        width = sum(x1 - x0 for x0, x1 in ranges)
+        if max(width, y1 - y0) * world_px > MAX_VIEWPORT_PX:
+            raise ValueError(f"bbox too large for zoom {zoom}")
+
+        results = []
+        for x0, x1 in ranges:
+            for i in level.query(x0, y0, x1, y1):
+                ref = level.refs[i]
+                if ref >= 0:
+                    results.append({**indexed[ref], "cluster": False})
+                else:
+                    results.append({
+                        "cluster": True,
+                        "id": f"c{zoom}-{i}",
+                        "lat": y_to_lat(level.ys[i]),
+                        "lng": x_to_lng(level.xs[i]),
+                        "count": level.counts[i],
+                        "expansion_zoom": min(zoom + 1, self.max_zoom + 1),
+                    })
+        return results
+
+# === Benchmark ===
+def benchmark(sizes=(1000, 10000, 100000)):
+    import random
+
+    rng = random.Random(7)
+    viewports = [
+        ("z6 region", (-106.0, 33.0, -94.0, 39.0), 6),
+        ("z10 county", (-100.6, 35.7, -99.9, 36.1), 10),
+        ("z15 street", (-100.31, 35.99, -100.29, 36.01), 15),
+    ]
+    for size in sizes:
+        store = MarkerStore(None)
+        store.upsert({
+            "id": str(i),
+            "name": f"WP{i}",
+            "lat": rng.gauss(36.0, 1.5),
+            "lng": rng.gauss(-100.0, 2.5),
+        } for i in range(size))
+
+        start = time.perf_counter()
+        store.build()
+        build = time.perf_counter() - start
+        print(f"{size:>7,} markers: index built in {build:.2f}s")
+
+        markers = store.all()
+        for label, (west, south, east, north), zoom in viewports:
+            start = time.perf_counter()
+            for _ in range(20):
+                results = store.query(west, south, east, north, zoom)
+            indexed = (time.perf_counter() - start) / 20
+
+            start = time.perf_counter()
+            for _ in range(5):
+                naive = [m for m in markers if south <= m["lat"] <= north and west <= m["lng"] <= east]
+            scan = (time.perf_counter() - start) / 5
+            print(f"    {label:11} {len(results):>6,} items in {indexed * 1000:7.2f} ms   "
+                  f"(scan: {len(naive):>6,} raw markers in {scan * 1000:7.2f} ms)")
+
+if __name__ == '__main__':
+    benchmark()
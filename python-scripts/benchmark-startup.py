@@ -0,0 +1,78 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import http.client
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PORT = 1776
+
+def time_to_first_byte(path, started_at, timeout):
+    while time.time() - started_at < timeout:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", PORT, timeout=2)
+            conn.request("GET", path)
+            response = conn.getresponse()  # Returns once the status line arrives.
+            elapsed = time.time() - started_at
+            body = response.read()
+            conn.close()
+            return elapsed, response.status, body
+        except (ConnectionError, OSError, http.client.HTTPException):
+            time.sleep(0.02)
+    return None, None, None
+
+def wait_for_services(started_at, timeout):
+    while time.time() - started_at < timeout:
+        _, status, body = time_to_first_byte("/api/services", time.time(), 2)
+        if status == 200:
+            services = json.loads(body)
+            if services and all(s["state"] != "starting" for s in services.values()):
+                return time.time() - started_at, services
+        time.sleep(0.1)
+    return None, None
+
+def run_once(timeout):
+    started_at = time.time()
+    proc = subprocess.Popen(
+        [sys.executable, "start.py", "--no-browser"],
+        cwd=ROOT_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        ttfb, status, _ = time_to_first_byte("/", started_at, timeout)
+        ready, services = wait_for_services(started_at, timeout)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return ttfb, status, ready, services
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure Reaper Net time-to-first-byte after launch.")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    results = []
+    for i in range(args.runs):
+        ttfb, status, ready, services = run_once(args.timeout)
+        if ttfb is None:
+            print(f"Run {i + 1}: server never answered within {args.timeout}s")
+            continue
+        ready_text = f"{ready:.2f}s" if ready is not None else "timeout"
+        print(f"Run {i + 1}: first byte of / in {ttfb:.3f}s (HTTP {status}), services settled in {ready_text}")
+        for name, service in (services or {}).items():
+            print(f"    {name:18} {service['state']:8} {service.get('detail') or ''}")
+        results.append(ttfb)
+        time.sleep(1)  # Let the port free up between runs.
+
+    if results:
+        print(f"\nTTFB best {min(results):.3f}s / median {sorted(results)[len(results) // 2]:.3f}s over {len(results)} runs")
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,17 @@
-import serial
-import threading
-import socketserver
+import time
 import json
+import threading
+import itertools
+import collections
+import http.server
+from urllib.parse import urlparse, parse_qs
 
+import serial
 import serial.tools.list_ports
-import http.server
+
+HTTP_PORT = 1776
+LINE_HISTORY_SIZE = 2000
+SSE_KEEPALIVE_SECONDS = 15
 
 def list_com_ports():
     ports = serial.tools.list_ports.comports()
@@ -25,44 +32,176 @@ def select_baud_rate():
     baud_rate = input("Enter baud rate (e.g., 9600): ")
     return int(baud_rate)
 
+# === Recent Line Buffer ===
+# Bounded history of serial lines with increasing sequence numbers. The reader
+# only appends; each client keeps its own cursor, so a slow client falls behind
+# (and skips ahead once its lines are evicted) without ever blocking the reader.
+class LineRing:
+    def __init__(self, size=LINE_HISTORY_SIZE):
+        self.lines = collections.deque(maxlen=size)
+        self.next_seq = 0
+        self.cond = threading.Condition()
+
+    def append(self, line):
+        with self.cond:
+            self.lines.append((self.next_seq, time.time(), line))
+            self.next_seq += 1
+            self.cond.notify_all()
+
+    def oldest_seq(self):
+        return self.lines[0][0] if self.lines else self.next_seq
+
+    # Returns (entries, next_cursor, dropped) for everything at or after cursor.
+    # A cursor past next_seq was issued before a gateway restart, so it starts
+    # over from the beginning of this run; a negative one is treated as 0.
+    def read_since(self, cursor, timeout=None):
+        with self.cond:
+            if cursor < 0 or cursor > self.next_seq:
+                cursor = 0
+            if cursor >= self.next_seq and timeout:
+                self.cond.wait_for(lambda: self.next_seq > cursor, timeout)
+            oldest = self.oldest_seq()
+            dropped = max(oldest - cursor, 0)
+            start = max(cursor, oldest) - oldest
+            entries = list(itertools.islice(self.lines, start, None))
+            return entries, self.next_seq, dropped
+
+line_ring = LineRing()
+nina_serial = None
+write_lock = threading.Lock()
+
+# Blocking readline with the port timeout; no busy polling on in_waiting.
 def serial_reader(ser):
     while True:
         try:
-            if ser.in_waiting > 0:
-                print(ser.readline().decode('utf-8').strip())
+            raw = ser.readline()
         except Exception as e:
             print(f"Error reading from serial port: {e}")
             break
+        if not raw:
+            continue
+        line = raw.decode('utf-8', errors='ignore').strip()
+        if line:
+            print(line)
+            line_ring.append(line)
+
+def send_command(ser, command):
+    with write_lock:
+        ser.write(command.encode('utf-8') + b'\n')
 
 def serial_writer(ser):
     while True:
         try:
             command = input("Enter command to send to the device: ")
-            ser.write(command.encode('utf-8') + b'\n')
+            send_command(ser, command)
         except Exception as e:
             print(f"Error writing to serial port: {e}")
             break
 
-class SimpleHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
+# === HTTP Gateway ===
+class NinaRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def cursor_from_request(self, query):
+        if 'since' in query:
+            return int(query['since'][0])
+        last_event_id = self.headers.get('Last-Event-ID')
+        if last_event_id is not None:
+            return int(last_event_id) + 1
+        return None
+
     def do_GET(self):
-        if self.path == '/api/test':
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            response = {'message': 'This is a test endpoint'}
-            self.wfile.write(json.dumps(response).encode('utf-8'))
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        try:
+            cursor = self.cursor_from_request(query)
+        except ValueError:
+            self.send_json({'error': 'Invalid cursor'}, 400)
+            return
+
+        if url.path == '/api/test':
+            self.send_json({'message': 'This is a test endpoint'})
+        elif url.path == '/api/status':
+            self.send_json({
+                'serial_connected': nina_serial is not None and nina_serial.is_open,
+                'port': nina_serial.port if nina_serial else None,
+                'lines_received': line_ring.next_seq,
+                'oldest_seq': line_ring.oldest_seq(),
+            })
+        elif url.path == '/api/lines':
+            entries, next_cursor, dropped = line_ring.read_since(line_ring.oldest_seq() if cursor is None else cursor)
+            self.send_json({
+                'lines': [{'seq': seq, 'timestamp': ts, 'line': line} for seq, ts, line in entries],
+                'next': next_cursor,
+                'dropped': dropped,
+            })
+        elif url.path == '/api/stream':
+            self.stream_lines(line_ring.next_seq if cursor is None else cursor)
         else:
-            self.send_response(404)
-            self.end_headers()
+            self.send_json({'error': 'Not found'}, 404)
+
+    def do_POST(self):
+        if urlparse(self.path).path != '/api/send':
+            self.send_json({'error': 'Not found'}, 404)
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            data = json.loads(self.rfile.read(length) or b'{}')
+        except json.JSONDecodeError:
+            self.send_json({'error': 'Invalid JSON'}, 400)
+            return
+        command = str(data.get('command', '')).strip()
+        if not command or nina_serial is None:
+            self.send_json({'error': 'No command or serial port'}, 400)
+            return
+        send_command(nina_serial, command)
+        self.send_json({'sent': command})
+
+    # Server-Sent Events: each client runs in its own thread and only reads
+    # from the ring with its own cursor.
+    def stream_lines(self, cursor):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'keep-alive')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.close_connection = True
+        try:
+            while True:
+                entries, cursor, dropped = line_ring.read_since(cursor, timeout=SSE_KEEPALIVE_SECONDS)
+                chunks = []
+                if dropped:
+                    chunks.append(f"event: dropped\ndata: {dropped}\n\n")
+                for seq, ts, line in entries:
+                    chunks.append(f"id: {seq}\ndata: {json.dumps({'timestamp': ts, 'line': line})}\n\n")
+                if not chunks:
+                    chunks.append(": keepalive\n\n")
+                self.wfile.write("".join(chunks).encode('utf-8'))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError, OSError):
+            pass
 
 def start_http_server():
-    PORT = 1776
-    handler = SimpleHTTPRequestHandler
-    with socketserver.TCPServer(("", PORT), handler) as httpd:
-        print(f"Serving HTTP on port {PORT}")
-        httpd.serve_forever()
+    httpd = http.server.ThreadingHTTPServer(("", HTTP_PORT), NinaRequestHandler)
+    httpd.daemon_threads = True
+    print(f"Serving HTTP on port {HTTP_PORT} (stream at /api/stream)")
+    httpd.serve_forever()
 
 def main():
+    global nina_serial
     com_port = select_com_port()
     if not com_port:
         return
@@ -76,10 +215,11 @@ def main():
         print(f"Failed to connect to {com_port}: {e}")
         return
 
+    nina_serial = ser
     threading.Thread(target=serial_reader, args=(ser,), daemon=True).start()
     threading.Thread(target=start_http_server, daemon=True).start()
 
     serial_writer(ser)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,225 @@
+import time
+import queue
+import threading
+
+REAPER_NODE_BAUDRATE = 115200
+REAPER_NODE_READ_TIMEOUT = 0.5
+
+# Weight of the newest sample in the running latency average.
+LATENCY_EWMA_ALPHA = 0.2
+
+# === Position Lines ===
+# GPS|LAT,LON,ALT,SPEED,HEADING,SATS             - the attached node's own fix
+# RECV|BEACON|DEVICE|LAT,LON,ALT,SPEED,HEADING,SATS - a remote node's beacon
+# Returns (device, telemetry) with device None for the local GPS, or None.
+def parse_position_line(line):
+    parts = line.split("|")
+    if parts[0] == "GPS" and len(parts) > 1:
+        device, fields = None, parts[1]
+    elif parts[0] == "RECV" and len(parts) > 3 and parts[1] == "BEACON":
+        device, fields = parts[2], parts[3]
+    else:
+        return None
+    values = fields.split(",")
+    try:
+        lat, lon = float(values[0]), float(values[1])
+    except (IndexError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180) or (lat == 0 and lon == 0):
+        return None  # No fix.
+    telemetry = {"latitude": lat, "longitude": lon}
+    for key, value in zip(("altitude", "speed", "heading", "satellites"), values[2:6]):
+        try:
+            telemetry[key] = float(value)
+        except ValueError:
+            telemetry[key] = None
+    return device, telemetry
+
+# === Single Serial Node ===
+class ReaperNode:
+    def __init__(self, node_id, port, name, events, baudrate=REAPER_NODE_BAUDRATE):
+        # Imported here so parse_position_line doesn't pull in pyserial.
+        import serial
+
+        self.node_id = node_id
+        self.port = port
+        self.name = name
+        self.events = events
+        self.serial = serial.Serial(port, baudrate, timeout=REAPER_NODE_READ_TIMEOUT)
+        self.commands = queue.Queue()
+        self.connected = True
+        self.stats = {
+            "lines_in": 0,
+            "bytes_in": 0,
+            "lines_out": 0,
+            "bytes_out": 0,
+            "errors": 0,
+            "last_line_at": None,
+            "last_write_at": None,
+            "write_latency_ms": 0.0,
+            "write_latency_avg_ms": 0.0,
+        }
+        self.started_at = time.time()
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+
+    def start(self):
+        self._reader.start()
+        self._writer.start()
+
+    def send(self, command):
+        self.commands.put((command, time.perf_counter()))
+
+    def pending(self):
+        return self.commands.qsize()
+
+    def close(self):
+        self.connected = False
+        self.commands.put(None)
+        try:
+            self.serial.close()
+        except Exception:
+            pass
+
+    # Blocking readline with a short timeout: no busy polling on in_waiting.
+    def _read_loop(self):
+        while self.connected:
+            try:
+                raw = self.serial.readline()
+            except Exception as e:
+                print(f"[{self.node_id}] Serial read error: {e}")
+                self.stats["errors"] += 1
+                self.connected = False
+                break
+            if not raw:
+                continue
+            line = raw.decode(errors='ignore').strip()
+            if not line:
+                continue
+            now = time.time()
+            self.stats["lines_in"] += 1
+            self.stats["bytes_in"] += len(raw)
+            self.stats["last_line_at"] = now
+            self.events.put((self.node_id, line, now))
+
+    def _write_loop(self):
+        while True:
+            item = self.commands.get()
+            if item is None or not self.connected:
+                break
+            command, queued_at = item
+            data = f"{command}\n".encode()
+            try:
+                self.serial.write(data)
+            except Exception as e:
+                print(f"[{self.node_id}] Serial write error: {e}")
+                self.stats["errors"] += 1
+                self.connected = False
+                break
+            latency_ms = (time.perf_counter() - queued_at) * 1000.0
+            avg = self.stats["write_latency_avg_ms"]
+            if self.stats["lines_out"] == 0:
+                avg = latency_ms
+            else:
+                avg += LATENCY_EWMA_ALPHA * (latency_ms - avg)
+            self.stats["lines_out"] += 1
+            self.stats["bytes_out"] += len(data)
+            self.stats["last_write_at"] = time.time()
+            self.stats["write_latency_ms"] = round(latency_ms, 3)
+            self.stats["write_latency_avg_ms"] = round(avg, 3)
+
+    def info(self):
+        uptime = max(time.time() - self.started_at, 1e-6)
+        return {
+            "node_id": self.node_id,
+            "name": self.name,
+            "port": self.port,
+            "connected": self.connected,
+            "pending": self.pending(),
+            "lines_in_per_sec": round(self.stats["lines_in"] / uptime, 3),
+            "lines_out_per_sec": round(self.stats["lines_out"] / uptime, 3),
+            **self.stats,
+        }
+
+# === Multi-Node Manager ===
+# Owns every connected node and merges their inbound lines into one stream.
+# on_line(node_id, line, timestamp) is called from a single dispatcher thread,
+# so handlers never run concurrently with each other.
+class ReaperNodeManager:
+    def __init__(self, on_line=None):
+        self.on_line = on_line
+        self.nodes = {}
+        self.events = queue.Queue()
+        self._lock = threading.Lock()
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True)
+        self._dispatcher.start()
+
+    def add_node(self, port, name):
+        with self._lock:
+            node_id = name if name and name not in self.nodes else port
+            node = ReaperNode(node_id, port, name, self.events)
+            self.nodes[node_id] = node
+        node.start()
+        return node
+
+    def remove_node(self, node_id):
+        with self._lock:
+            node = self.nodes.pop(node_id, None)
+        if node:
+            node.close()
+
+    def connected_nodes(self):
+        with self._lock:
+            return [n for n in self.nodes.values() if n.connected]
+
+    def least_busy(self):
+        nodes = self.connected_nodes()
+        if not nodes:
+            return None
+        return min(nodes, key=lambda n: (n.pending(), n.stats["lines_out"]))
+
+    # Route to the requested node, or to the least-busy one when none is given.
+    def send(self, command, node_id=None):
+        if node_id:
+            with self._lock:
+                node = self.nodes.get(node_id)
+            if not node or not node.connected:
+                return None
+        else:
+            node = self.least_busy()
+            if not node:
+                return None
+        node.send(command)
+        return node.node_id
+
+    def broadcast(self, command):
+        sent = []
+        for node in self.connected_nodes():
+            node.send(command)
+            sent.append(node.node_id)
+        return sent
+
+    def stats(self):
+        with self._lock:
+            return [n.info() for n in self.nodes.values()]
+
+    def close(self):
+        with self._lock:
+            nodes = list(self.nodes.values())
+            self.nodes.clear()
+        for node in nodes:
+            node.close()
+        self.events.put(None)
+
+    def _dispatch_loop(self):
+        while True:
+            event = self.events.get()
+            if event is None:
+                break
+            if not self.on_line:
+                continue
+            node_id, line, timestamp = event
+            try:
+                self.on_line(node_id, line, timestamp)
+            except Exception as e:
+                print(f"[{node_id}] Line handler error: {e}")
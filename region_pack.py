@@ -0,0 +1,362 @@
+import os
+import json
+import time
+import uuid
+import struct
+import sqlite3
+import hashlib
+import argparse
+
+from tile_math import tile_bounds, tile_range
+
+# === Region Pack Format ===
+# Single file, written and read strictly front to back:
+#   PACK_MAGIC, uint32 metadata length, metadata JSON
+#   tile records sorted by (z, x, y):
+#     >BIIB8sI  z, x, y, ext length, blake2b-64 hash, data length
+#     ext bytes, data bytes
+#   A data length of TOMBSTONE marks a tile deleted since the base pack.
+#   A record with z == END_ZOOM terminates the pack.
+# Because records are sorted, delta builds merge-join the source against the
+# base pack and imports apply records as they stream, so memory stays flat.
+PACK_MAGIC = b"RNPACK1\0"
+RECORD = struct.Struct(">BIIB8sI")
+TOMBSTONE = 0xFFFFFFFF
+END_ZOOM = 0xFF
+
+TILE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".pbf")
+
+def tile_hash(data):
+    return hashlib.blake2b(data, digest_size=8).digest()
+
+def _point_in_polygon(lat, lon, points):
+    inside = False
+    j = len(points) - 1
+    for i in range(len(points)):
+        lat_i, lon_i = points[i]
+        lat_j, lon_j = points[j]
+        if (lat_i > lat) != (lat_j > lat):
+            if lon < (lon_j - lon_i) * (lat - lat_i) / (lat_j - lat_i) + lon_i:
+                inside = not inside
+        j = i
+    return inside
+
+def _segments_cross(a, b, c, d):
+    def orient(p, q, r):
+        return (q[0] - p[0]) * (r[1] - p[1]) - (q[1] - p[1]) * (r[0] - p[0])
+    return (orient(a, b, c) > 0) != (orient(a, b, d) > 0) and (orient(c, d, a) > 0) != (orient(c, d, b) > 0)
+
+class Region:
+    def __init__(self, points):
+        if len(points) < 3:
+            raise ValueError("Region polygon needs at least 3 points")
+        self.points = [(float(lat), float(lon)) for lat, lon in points]
+        lats = [p[0] for p in self.points]
+        lons = [p[1] for p in self.points]
+        self.bbox = (min(lats), min(lons), max(lats), max(lons))
+
+    # Load "lat_min,lon_min,lat_max,lon_max" or a GeoJSON Polygon/Feature file.
+    @classmethod
+    def from_arg(cls, value):
+        if os.path.exists(value):
+            with open(value) as f:
+                geo = json.load(f)
+            if geo.get("type") == "FeatureCollection":
+                geo = geo["features"][0]
+            if geo.get("type") == "Feature":
+                geo = geo["geometry"]
+            if geo.get("type") != "Polygon":
+                raise ValueError("GeoJSON region must be a Polygon")
+            return cls([(lat, lon) for lon, lat, *_ in geo["coordinates"][0]])
+        lat_min, lon_min, lat_max, lon_max = [float(v) for v in value.split(",")]
+        return cls([(lat_min, lon_min), (lat_min, lon_max), (lat_max, lon_max), (lat_max, lon_min)])
+
+    def tile_range(self, zoom):
+        return tile_range(*self.bbox, zoom)
+
+    def intersects_tile(self, x, y, zoom):
+        lat_min, lon_min, lat_max, lon_max = tile_bounds(x, y, zoom)
+        b = self.bbox
+        if lat_max < b[0] or lat_min > b[2] or lon_max < b[1] or lon_min > b[3]:
+            return False
+        corners = [(lat_min, lon_min), (lat_min, lon_max), (lat_max, lon_max), (lat_max, lon_min)]
+        if any(_point_in_polygon(lat, lon, self.points) for lat, lon in corners):
+            return True
+        if any(lat_min <= lat <= lat_max and lon_min <= lon <= lon_max for lat, lon in self.points):
+            return True
+        edges = list(zip(corners, corners[1:] + corners[:1]))
+        ring = list(zip(self.points, self.points[1:] + self.points[:1]))
+        return any(_segments_cross(a, b, c, d) for a, b in ring for c, d in edges)
+
+# === Tile Sources ===
+# Every source yields (z, x, y, ext, data) sorted by (z, x, y).
+def _numeric_entries(path):
+    try:
+        names = os.listdir(path)
+    except FileNotFoundError:
+        return []
+    entries = []
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        if stem.isdigit():
+            entries.append((int(stem), ext, name))
+    entries.sort()
+    return entries
+
+# Loose z/x/y.ext directories as written by the downloaders. Only one x column
+# is listed at a time.
+def iter_directory_tiles(root, zooms, region):
+    for z in zooms:
+        x0, x1, y0, y1 = region.tile_range(z)
+        for x, _, x_name in _numeric_entries(os.path.join(root, str(z))):
+            if x < x0 or x > x1:
+                continue
+            column = os.path.join(root, str(z), x_name)
+            for y, ext, name in _numeric_entries(column):
+                if y < y0 or y > y1 or ext.lower() not in TILE_EXTENSIONS:
+                    continue
+                if not region.intersects_tile(x, y, z):
+                    continue
+                with open(os.path.join(column, name), "rb") as f:
+                    yield z, x, y, ext.lower(), f.read()
+
+def _mbtiles_ext(conn):
+    row = conn.execute("SELECT value FROM metadata WHERE name = 'format'").fetchone()
+    return "." + (row[0] if row else "png")
+
+# MBTiles rows are TMS (y flipped); tile_row DESC gives XYZ y ascending.
+def iter_mbtiles_tiles(path, zooms, region):
+    conn = sqlite3.connect(path)
+    try:
+        ext = _mbtiles_ext(conn)
+        for z in zooms:
+            x0, x1, y0, y1 = region.tile_range(z)
+            flip = (1 << z) - 1
+            rows = conn.execute(
+                "SELECT tile_column, tile_row, tile_data FROM tiles "
+                "WHERE zoom_level = ? AND tile_column BETWEEN ? AND ? AND tile_row BETWEEN ? AND ? "
+                "ORDER BY tile_column, tile_row DESC",
+                (z, x0, x1, flip - y1, flip - y0)
+            )
+            for x, tms_y, data in rows:
+                y = flip - tms_y
+                if region.intersects_tile(x, y, z):
+                    yield z, x, y, ext, bytes(data)
+    finally:
+        conn.close()
+
+def iter_source_tiles(source, zooms, region):
+    if os.path.isdir(source):
+        return iter_directory_tiles(source, zooms, region)
+    return iter_mbtiles_tiles(source, zooms, region)
+
+# === Pack Reader / Writer ===
+def read_pack(path, with_data=True):
+    f = open(path, "rb")
+    if f.read(len(PACK_MAGIC)) != PACK_MAGIC:
+        f.close()
+        raise ValueError(f"{path} is not a region pack")
+    (meta_len,) = struct.unpack(">I", f.read(4))
+    meta = json.loads(f.read(meta_len))
+
+    def records():
+        try:
+            while True:
+                header = f.read(RECORD.size)
+                if len(header) < RECORD.size:
+                    raise ValueError(f"{path} is truncated")
+                z, x, y, ext_len, digest, length = RECORD.unpack(header)
+                if z == END_ZOOM:
+                    return
+                ext = f.read(ext_len).decode()
+                if length == TOMBSTONE:
+                    yield z, x, y, ext, digest, None
+                elif with_data:
+                    yield z, x, y, ext, digest, f.read(length)
+                else:
+                    f.seek(length, os.SEEK_CUR)
+                    yield z, x, y, ext, digest, b""
+        finally:
+            f.close()
+
+    return meta, records()
+
+def _write_record(f, z, x, y, ext, digest, data):
+    ext_bytes = ext.encode()
+    length = TOMBSTONE if data is None else len(data)
+    f.write(RECORD.pack(z, x, y, len(ext_bytes), digest, length))
+    f.write(ext_bytes)
+    if data is not None:
+        f.write(data)
+
+def build_pack(source, out_path, region, zooms, base_path=None, name=None):
+    zooms = sorted(zooms)
+    meta = {
+        "id": uuid.uuid4().hex,
+        "name": name or os.path.splitext(os.path.basename(out_path))[0],
+        "created": time.time(),
+        "zooms": zooms,
+        "region": region.points,
+        "base": None,
+    }
+
+    # Base pack records, streamed in the same (z, x, y) order as the source.
+    base_records = iter(())
+    if base_path:
+        base_meta, base_records = read_pack(base_path, with_data=False)
+        if base_meta.get("base"):
+            raise ValueError("Delta base must be a full pack, not another delta")
+        meta["base"] = base_meta["id"]
+    base = next(base_records, None)
+
+    stats = {"written": 0, "unchanged": 0, "deleted": 0, "bytes": 0}
+    tmp_path = out_path + ".tmp"
+    meta_bytes = json.dumps(meta).encode()
+    with open(tmp_path, "wb") as f:
+        f.write(PACK_MAGIC)
+        f.write(struct.pack(">I", len(meta_bytes)))
+        f.write(meta_bytes)
+
+        for z, x, y, ext, data in iter_source_tiles(source, zooms, region):
+            key = (z, x, y)
+            # Base tiles that sort before this one no longer exist.
+            while base and base[:3] < key:
+                if base[5] is not None and base[0] in zooms and region.intersects_tile(base[1], base[2], base[0]):
+                    _write_record(f, base[0], base[1], base[2], base[3], base[4], None)
+                    stats["deleted"] += 1
+                base = next(base_records, None)
+            digest = tile_hash(data)
+            if base and base[:3] == key:
+                unchanged = base[5] is not None and base[4] == digest
+                base = next(base_records, None)
+                if unchanged:
+                    stats["unchanged"] += 1
+                    continue
+            _write_record(f, z, x, y, ext, digest, data)
+            stats["written"] += 1
+            stats["bytes"] += len(data)
+
+        while base:
+            if base[5] is not None and base[0] in zooms and region.intersects_tile(base[1], base[2], base[0]):
+                _write_record(f, base[0], base[1], base[2], base[3], base[4], None)
+                stats["deleted"] += 1
+            base = next(base_records, None)
+
+        f.write(RECORD.pack(END_ZOOM, 0, 0, 0, b"\0" * 8, 0))
+    os.replace(tmp_path, out_path)
+    return meta, stats
+
+# === Import ===
+def _import_directory(records, dest):
+    stats = {"written": 0, "deleted": 0}
+    for z, x, y, ext, _, data in records:
+        column = os.path.join(dest, str(z), str(x))
+        path = os.path.join(column, f"{y}{ext}")
+        if data is None:
+            if os.path.exists(path):
+                os.remove(path)
+                stats["deleted"] += 1
+            continue
+        os.makedirs(column, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        stats["written"] += 1
+    return stats
+
+def _import_mbtiles(records, dest, batch_size=500):
+    conn = sqlite3.connect(dest)
+    conn.execute("CREATE TABLE IF NOT EXISTS metadata (name TEXT, value TEXT)")
+    conn.execute("CREATE TABLE IF NOT EXISTS tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB)")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS tile_index ON tiles (zoom_level, tile_column, tile_row)")
+    stats = {"written": 0, "deleted": 0}
+    upserts, deletes = [], []
+
+    def flush():
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?)", upserts)
+            conn.executemany("DELETE FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?", deletes)
+        upserts.clear()
+        deletes.clear()
+
+    for z, x, y, ext, _, data in records:
+        tms_y = (1 << z) - 1 - y
+        if data is None:
+            deletes.append((z, x, tms_y))
+            stats["deleted"] += 1
+        else:
+            upserts.append((z, x, tms_y, sqlite3.Binary(data)))
+            stats["written"] += 1
+        if len(upserts) + len(deletes) >= batch_size:
+            flush()
+    flush()
+    conn.close()
+    return stats
+
+def import_pack(pack_path, dest):
+    meta, records = read_pack(pack_path)
+    if dest.endswith(".mbtiles"):
+        stats = _import_mbtiles(records, dest)
+    else:
+        stats = _import_directory(records, dest)
+    return meta, stats
+
+def pack_info(pack_path):
+    meta, records = read_pack(pack_path, with_data=False)
+    tiles = deleted = 0
+    per_zoom = {}
+    for z, _, _, _, _, data in records:
+        if data is None:
+            deleted += 1
+        else:
+            tiles += 1
+            per_zoom[z] = per_zoom.get(z, 0) + 1
+    return meta, {"tiles": tiles, "deleted": deleted, "per_zoom": per_zoom, "size": os.path.getsize(pack_path)}
+
+def parse_zooms(value):
+    zooms = set()
+    for part in value.split(","):
+        if "-" in part:
+            lo, hi = part.split("-")
+            zooms.update(range(int(lo), int(hi) + 1))
+        else:
+            zooms.add(int(part))
+    return sorted(zooms)
+
+def main():
+    parser = argparse.ArgumentParser(description="Build, inspect and import offline region packs.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Write a pack for a region and zoom range")
+    build.add_argument("--source", required=True, help="Tile directory (z/x/y.ext) or .mbtiles file")
+    build.add_argument("--region", required=True, help="lat_min,lon_min,lat_max,lon_max or a GeoJSON polygon file")
+    build.add_argument("--zooms", required=True, help="e.g. 5-14 or 10,12,14")
+    build.add_argument("--out", required=True)
+    build.add_argument("--base", help="Previous full pack; only changed tiles are written")
+    build.add_argument("--name")
+
+    imp = sub.add_parser("import", help="Merge a pack into a tile directory or .mbtiles file")
+    imp.add_argument("pack")
+    imp.add_argument("--dest", required=True)
+
+    info = sub.add_parser("info", help="Summarise a pack")
+    info.add_argument("pack")
+
+    args = parser.parse_args()
+    started = time.time()
+    if args.command == "build":
+        meta, stats = build_pack(args.source, args.out, Region.from_arg(args.region), parse_zooms(args.zooms), args.base, args.name)
+        kind = "Delta" if meta["base"] else "Full"
+        print(f"{kind} pack {args.out}: {stats['written']:,} tiles ({stats['bytes'] / 1e6:.1f} MB), "
+              f"{stats['unchanged']:,} unchanged, {stats['deleted']:,} deleted in {time.time() - started:.1f}s")
+    elif args.command == "import":
+        meta, stats = import_pack(args.pack, args.dest)
+        print(f"Imported {meta['name']} into {args.dest}: {stats['written']:,} tiles written, "
+              f"{stats['deleted']:,} deleted in {time.time() - started:.1f}s")
+    else:
+        meta, stats = pack_info(args.pack)
+        print(json.dumps({**meta, **stats}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import time
+
+# === SBS-1 (BaseStation) Format ===
+SBS1_FIELDS = [
+    "message_type", "transmission_type", "session_id", "aircraft_id",
+    "hex_ident", "flight_id", "generated_date", "generated_time",
+    "logged_date", "logged_time", "callsign", "altitude", "ground_speed",
+    "track", "lat", "lon", "vertical_rate", "squawk",
+    "alert", "emergency", "spi", "is_on_ground"
+]
+
+def parse_sbs1_line(line):
+    parts = line.strip().split(',')
+    if len(parts) < 22:
+        return None
+
+    parsed = dict(zip(SBS1_FIELDS, parts))
+    return parsed
+
+# Merge one parsed report (SBS-1 or decoded Beast) into the aircraft state.
+# Returns the ICAO and merged state, or (None, None) if the report has no address.
+def merge_aircraft_update(aircraft_data, parsed):
+    icao = parsed.get("hex_ident")
+    if not icao:
+        return None, None
+    ac = aircraft_data.setdefault(icao, {})
+    ac.update({k: v for k, v in parsed.items() if v})
+    ac["last_seen"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    return icao, ac
@@ -1,37 +1,78 @@
 import os
+import sys
 import time
 import socket
-import serial
 import threading
-import webbrowser
-import sqlite3
-import serial.tools.list_ports
 from flask import Flask, jsonify, send_from_directory, request
 from flask_socketio import SocketIO
-import subprocess
+from aircraft_tracks import TrackStore
+from sbs1 import merge_aircraft_update
+from aircraft_feeds import AircraftFeedManager
+from reaper_nodes import parse_position_line
+from geofence import GeofenceEngine
+
+# pyserial, sqlite3 and the Beast decoder are imported by the background
+# services that need them, so the HTTP server can bind before they load.
 
 # === Flask + SocketIO setup ===
 app = Flask(__name__, static_folder='.', static_url_path='')
 socketio = SocketIO(app, cors_allowed_origins="*")
 
+SERVER_PORT = 1776
+
 # === Reaper Node Serial State ===
-reaper_node_serial = None
-reaper_node_connected = False
-connected_reaper_node_port = None
-connected_reaper_node_name = None
-aircraft_srd_connected = False
+reaper_nodes = None
 
 REAPER_NODE_DETECTION_TIMEOUT = 4
 
+# === Background Services ===
+# name -> {"state": starting|ready|stopped|failed, "detail": str, "since": ts}
+services = {}
+INTERNET_CHECK_INTERVAL = 30
+internet_connected = False
+
 # AIRCRAFT DATA
 aircraft_data = {}
-SBS1_FIELDS = [
-    "message_type", "transmission_type", "session_id", "aircraft_id",
-    "hex_ident", "flight_id", "generated_date", "generated_time",
-    "logged_date", "logged_time", "callsign", "altitude", "ground_speed",
-    "track", "lat", "lon", "vertical_rate", "squawk",
-    "alert", "emergency", "spi", "is_on_ground"
+aircraft_tracks = TrackStore()
+
+# One entry per receiver. "sbs1" reads BaseStation text (dump1090 port 30003),
+# "beast" reads the binary feed (port 30005). Reports from all feeds are merged.
+AIRCRAFT_FEEDS = [
+    {"name": "local", "host": "127.0.0.1", "port": 30003, "format": "sbs1"},
 ]
+AIRCRAFT_MAINTENANCE_INTERVAL = 60
+aircraft_feeds = AircraftFeedManager(on_report=lambda parsed: update_aircraft(parsed))
+
+# Observation history and friendly/enemy annotations survive restarts here.
+AIRCRAFT_ARCHIVE_PATH = "aircraft-archive.db"
+AIRCRAFT_ARCHIVE_RAW_HOURS = 24
+AIRCRAFT_ARCHIVE_SUMMARY_DAYS = 30
+aircraft_archive = None
+
+# GEOFENCES
+# Fences and proximity rules are saved here and reloaded at startup.
+GEOFENCE_CONFIG_PATH = "geofences.json"
+GEOFENCE_TARGET_EXPIRE_SECONDS = 10 * 60
+geofences = GeofenceEngine()
+
+# MAP MARKERS
+# Shared markers with server-side clustering; the map fetches one viewport at a time.
+MARKER_STORE_PATH = "markers.db"
+marker_store = None
+
+# MAP TILES
+# Tiles are served from memory, then TILE_STORE_PATH (a z/x/y directory or an
+# .mbtiles file), then TILE_DOWNLOAD_URL (None when offline only). GPS fixes from
+# the attached node prefetch the tiles ahead of the vehicle within the I/O budget.
+# TILE_SAVE_DOWNLOADS writes downloaded tiles into a directory store for offline
+# use; it is off by default because that directory is never trimmed.
+TILE_STORE_PATH = "tiles"
+TILE_DOWNLOAD_URL = "https://a.basemaps.cartocdn.com/dark_all/{z}/{x}/{y}.png"
+TILE_SAVE_DOWNLOADS = False
+TILE_CACHE_MB = 64
+TILE_PREFETCH_TILES_PER_SEC = 10
+TILE_PREFETCH_KB_PER_SEC = 1024
+tile_service = None
 
 # === Utility: Check Internet ===
 def check_internet():
@@ -41,8 +82,50 @@ def check_internet():
     except OSError:
         return False
 
+# Keeps /api/status from blocking up to 3s on every call when offline.
+def monitor_internet():
+    global internet_connected
+    while True:
+        internet_connected = check_internet()
+        set_service_state("internet", "ready", "online" if internet_connected else "offline")
+        time.sleep(INTERNET_CHECK_INTERVAL)
+
+# === Service Runner ===
+def set_service_state(name, state, detail=None):
+    services[name] = {"state": state, "detail": detail, "since": time.time()}
+
+# Run a subsystem in the background. One-shot targets are marked ready when
+# they return; long-running targets report their own state.
+def start_service(name, target):
+    # Registered before the thread starts, so /api/services never lists a subset.
+    set_service_state(name, "starting")
+
+    def run():
+        try:
+            target()
+        except Exception as e:
+            print(f"[!] Service {name} failed: {e}")
+            set_service_state(name, "failed", str(e))
+            return
+        if services[name]["state"] == "starting":
+            set_service_state(name, "ready")
+    threading.Thread(target=run, daemon=True).start()
+
+def wait_for_port(port, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
 # === Detect and Connect to Reaper Node ===
 def auto_find_reaper_mesh_node():
+    import serial
+    import serial.tools.list_ports
+
     print("Scanning for Reaper Mesh Node...")
     devices = {}
     for port in serial.tools.list_ports.comports():
@@ -66,61 +149,115 @@ def auto_find_reaper_mesh_node():
             print(f"Failed to open {port.device}: {e}")
     return devices
 
-# === Serial Reader Thread ===
-def serial_reader_thread(ser):
-    while True:
-        try:
-            if ser.in_waiting:
-                line = ser.readline().decode(errors='ignore').strip()
-                if line:
-                    print("[Reaper Node]", line)
-                    socketio.emit('reaper_node_received', {'line': line})
-        except Exception as e:
-            print("Serial read error:", e)
-            break
-        time.sleep(0.05)
+# === Merged Node Line Handler ===
+def handle_reaper_node_line(node_id, line, timestamp):
+    print(f"[Reaper Node {node_id}]", line)
+    socketio.emit('reaper_node_received', {'line': line, 'node_id': node_id, 'timestamp': timestamp})
+
+    position = parse_position_line(line)
+    if position:
+        device, telemetry = position
+        emit_geofence_events(geofences.update_target(
+            f"node:{device or node_id}", "node", telemetry["latitude"], telemetry["longitude"], timestamp
+        ))
+        if device is None and tile_service:
+            tile_service.update_position(
+                telemetry["latitude"], telemetry["longitude"], telemetry.get("speed"), telemetry.get("heading"), timestamp
+            )
+
+# === Geofence Alerts ===
+def emit_geofence_events(events):
+    for event in events:
+        socketio.emit('geofence_event', event)
 
 # === WebSocket Handler ===
 @socketio.on('send_reaper_node_command')
 def handle_send_command(data):
     print(f"[RECEIVED] {data}")
     command = data.get('command', '').strip()
-    if reaper_node_serial and command:
-        print(f"[SEND] {command}")
-        reaper_node_serial.write(f"{command}\n".encode())
+    if reaper_nodes and command:
+        node_id = reaper_nodes.send(command, data.get('node_id'))
+        if node_id:
+            print(f"[SEND {node_id}] {command}")
+        else:
+            print(f"[!] No connected node for command: {command}")
 
 # === Aircraft Monitor ===
-def parse_sbs1_line(line):
-    parts = line.strip().split(',')
-    if len(parts) < 22:
-        return None
+def update_aircraft(parsed):
+    icao, ac = merge_aircraft_update(aircraft_data, parsed)
+    if icao and parsed.get("lat") and parsed.get("lon"):
+        now = time.time()
+        aircraft_tracks.record(icao, ac, now)
+        emit_geofence_events(geofences.update_target(
+            f"aircraft:{icao}", "aircraft", float(ac["lat"]), float(ac["lon"]), now
+        ))
+        if aircraft_archive:
+            aircraft_archive.record(icao, ac, now)
 
-    parsed = dict(zip(SBS1_FIELDS, parts))
-    return parsed
+def start_aircraft_feeds():
+    for feed in AIRCRAFT_FEEDS:
+        aircraft_feeds.add_feed(feed["name"], feed["host"], feed["port"], feed.get("format", "sbs1"))
 
-def sbs1_listener(host='127.0.0.1', port=30003):
-    try:
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-            sock.connect((host, port))
-            print(f"[*] Connected to dump1090 on {host}:{port}")
-            global aircraft_srd_connected
-            aircraft_srd_connected = True
-            while True:
-                data = sock.recv(4096)
-                if not data:
-                    break
-
-                lines = data.decode(errors='ignore').splitlines()
-                for line in lines:
-                    parsed = parse_sbs1_line(line)
-                    if parsed and parsed.get("hex_ident"):
-                        icao = parsed["hex_ident"]
-                        # Merge fields into current state
-                        ac = aircraft_data.setdefault(icao, {})
-                        ac.update({k: v for k, v in parsed.items() if v})
-                        ac["last_seen"] = time.strftime("%Y-%m-%d %H:%M:%S")
-    except Exception as e:
-        print(f"[!] Error connecting to SBS1 feed: {e}")
+# Expire stale tracks and geofence targets.
+def aircraft_maintenance():
+    set_service_state("aircraft_maintenance", "ready")
+    while True:
+        time.sleep(AIRCRAFT_MAINTENANCE_INTERVAL)
+        aircraft_tracks.prune()
+        emit_geofence_events(geofences.prune_targets(GEOFENCE_TARGET_EXPIRE_SECONDS))
+
+# === Service Startup ===
+def start_aircraft_archive():
+    global aircraft_archive
+    from aircraft_archive import AircraftArchive
+
+    aircraft_archive = AircraftArchive(
+        os.path.join(app.root_path, AIRCRAFT_ARCHIVE_PATH),
+        raw_hours=AIRCRAFT_ARCHIVE_RAW_HOURS,
+        summary_days=AIRCRAFT_ARCHIVE_SUMMARY_DAYS,
+    )
+
+def start_marker_store():
+    global marker_store
+    from marker_store import MarkerStore
+
+    store = MarkerStore(os.path.join(app.root_path, MARKER_STORE_PATH))
+    # Publish first; queries build the index themselves until this warm-up is done.
+    marker_store = store
+    store.build()
+    set_service_state("marker_store", "ready", f"{len(store.markers)} markers")
+
+def start_tile_service():
+    global tile_service
+    from tile_prefetch import TileService, HTTPTileSource, open_tile_store
+
+    service = TileService(
+        store=open_tile_store(os.path.join(app.root_path, TILE_STORE_PATH)),
+        download=HTTPTileSource(TILE_DOWNLOAD_URL) if TILE_DOWNLOAD_URL else None,
+        cache_bytes=TILE_CACHE_MB * 1024 * 1024,
+        tiles_per_sec=TILE_PREFETCH_TILES_PER_SEC,
+        bytes_per_sec=TILE_PREFETCH_KB_PER_SEC * 1024,
+        save_downloads=TILE_SAVE_DOWNLOADS,
+    )
+    service.start()
+    tile_service = service
+
+def start_reaper_nodes():
+    global reaper_nodes
+    import serial
+    from reaper_nodes import ReaperNodeManager
+
+    reaper_nodes = ReaperNodeManager(on_line=handle_reaper_node_line)
+    devices = auto_find_reaper_mesh_node()
+    for port, name in devices.items():
+        try:
+            node = reaper_nodes.add_node(port, name)
+            print(f"Connected to Reaper Node at {port} ({name}) as {node.node_id}")
+        except (serial.SerialException, OSError) as e:
+            print(f"Failed to open {port}: {e}")
+    if not devices:
+        print("No Reaper Mesh Node detected.")
+    set_service_state("reaper_nodes", "ready", f"{len(reaper_nodes.connected_nodes())} connected")
 
 # === Routes ===
 @app.route('/')
@@ -130,17 +267,25 @@ def index():
 # Status API
 @app.route('/api/status')
 def api_status():
+    nodes = reaper_nodes.connected_nodes() if reaper_nodes else []
     return jsonify({
-        "internet_connected": check_internet(),
-        "reaper_node_connected": reaper_node_connected,
-        "aircraft_tracker_connected": aircraft_srd_connected,
-        "reaper_node_name": connected_reaper_node_name,
-        "reaper_node_port": connected_reaper_node_port,
+        "internet_connected": internet_connected,
+        "reaper_node_connected": bool(nodes),
+        "aircraft_tracker_connected": aircraft_feeds.any_connected(),
+        "reaper_node_name": nodes[0].name if nodes else None,
+        "reaper_node_port": nodes[0].port if nodes else None,
+        "reaper_nodes": [{"node_id": n.node_id, "name": n.name, "port": n.port} for n in nodes],
         "backend_version": "1.4.1",
         "frontend_version": "1.7.76",
         "system_time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()),
+        "services": dict(services),
     })
 
+# Readiness of background subsystems started after the server binds.
+@app.route('/api/services')
+def api_services():
+    return jsonify(dict(services))
+
 # Plugins API
 @app.route('/api/plugins')
 def list_plugins():
@@ -148,19 +293,195 @@ def list_plugins():
 	plugin_files = [f for f in os.listdir(plugins_dir) if f.endswith('.js')]
 	return jsonify([os.path.splitext(p)[0] for p in plugin_files])
 
+# Per-node throughput and latency stats
+@app.route('/api/nodes')
+def api_nodes():
+    return jsonify(reaper_nodes.stats() if reaper_nodes else [])
+
 @app.route('/api/aircraft')
 def get_aircraft():
-    return jsonify(aircraft_data)
+    now = time.time()
+    return jsonify({
+        icao: {
+            **ac,
+            "predicted": aircraft_tracks.predict(icao, now),
+            "annotation": aircraft_archive.get_annotation(icao) if aircraft_archive else None,
+        }
+        for icao, ac in list(aircraft_data.items())
+    })
+
+# Per-receiver connection state and message rates.
+@app.route('/api/aircraft/feeds')
+def api_aircraft_feeds():
+    return jsonify(aircraft_feeds.stats())
+
+# Position history for one aircraft. Optional query args:
+#   window      - only fixes from the last N seconds
+#   max_points  - decimate the trail down to at most N points
+@app.route('/api/aircraft/<icao>/trail')
+def get_aircraft_trail(icao):
+    window = request.args.get('window', type=float)
+    max_points = request.args.get('max_points', type=int)
+    if window is not None and not window > 0:
+        return jsonify({"error": "window must be a positive number of seconds"}), 400
+    if max_points is not None:
+        max_points = min(max(max_points, 1), 10000)
+    trail = aircraft_tracks.trail(icao.upper(), window=window, max_points=max_points)
+    if trail is None:
+        return jsonify({"error": "Unknown aircraft"}), 404
+    return jsonify(trail)
+
+# Archived observations. Optional query args: icao, since, until (unix seconds),
+# limit, and summary=1 for per-minute rollups of older data.
+@app.route('/api/aircraft/history')
+def get_aircraft_history():
+    if not aircraft_archive:
+        return jsonify({"error": "Archive disabled"}), 503
+    query = aircraft_archive.minutes if request.args.get('summary') == '1' else aircraft_archive.observations
+    return jsonify(query(
+        icao=request.args.get('icao', type=str, default='').upper() or None,
+        since=request.args.get('since', type=float),
+        until=request.args.get('until', type=float),
+        limit=min(max(request.args.get('limit', type=int, default=1000), 1), 10000),
+    ))
+
+@app.route('/api/aircraft/<icao>/annotation', methods=['GET', 'POST', 'DELETE'])
+def aircraft_annotation(icao):
+    if not aircraft_archive:
+        return jsonify({"error": "Archive disabled"}), 503
+    icao = icao.upper()
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            return jsonify(aircraft_archive.set_annotation(icao, data.get('affiliation'), data.get('description')))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    if request.method == 'DELETE':
+        return jsonify({"deleted": aircraft_archive.delete_annotation(icao)})
+    annotation = aircraft_archive.get_annotation(icao)
+    if annotation is None:
+        return jsonify({"error": "No annotation"}), 404
+    return jsonify(annotation)
+
+@app.route('/api/aircraft/annotations')
+def aircraft_annotations():
+    return jsonify(aircraft_archive.annotations if aircraft_archive else {})
+
+# Geofences (circle or polygon) and proximity rules. Enter/exit events are
+# pushed over Socket.IO as 'geofence_event'.
+@app.route('/api/geofences', methods=['GET', 'POST'])
+def api_geofences():
+    if request.method == 'POST':
+        try:
+            fence = geofences.add_fence(request.get_json(silent=True) or {})
+        except (KeyError, TypeError, ValueError) as e:
+            return jsonify({"error": f"Invalid geofence: {e}"}), 400
+        geofences.save(os.path.join(app.root_path, GEOFENCE_CONFIG_PATH))
+        return jsonify({k: v for k, v in fence.items() if k != "bbox"})
+    return jsonify(geofences.config()["fences"])
+
+@app.route('/api/geofences/<fence_id>', methods=['DELETE'])
+def api_delete_geofence(fence_id):
+    deleted = geofences.remove_fence(fence_id)
+    geofences.save(os.path.join(app.root_path, GEOFENCE_CONFIG_PATH))
+    return jsonify({"deleted": deleted})
+
+@app.route('/api/proximity-rules', methods=['GET', 'POST'])
+def api_proximity_rules():
+    if request.method == 'POST':
+        try:
+            rule = geofences.add_rule(request.get_json(silent=True) or {})
+        except (KeyError, TypeError, ValueError) as e:
+            return jsonify({"error": f"Invalid proximity rule: {e}"}), 400
+        geofences.save(os.path.join(app.root_path, GEOFENCE_CONFIG_PATH))
+        return jsonify(rule)
+    return jsonify(geofences.config()["rules"])
+
+@app.route('/api/proximity-rules/<rule_id>', methods=['DELETE'])
+def api_delete_proximity_rule(rule_id):
+    deleted = geofences.remove_rule(rule_id)
+    geofences.save(os.path.join(app.root_path, GEOFENCE_CONFIG_PATH))
+    return jsonify({"deleted": deleted})
+
+# Which targets are currently inside which fences / near each other.
+@app.route('/api/geofences/state')
+def api_geofence_state():
+    return jsonify(geofences.state())
+
+# Map markers. GET with bbox=west,south,east,north&zoom=z returns clusters and
+# single markers for that viewport; without bbox it returns every marker.
+# POST takes one marker or a list (bulk import / localStorage migration).
+@app.route('/api/markers', methods=['GET', 'POST'])
+def api_markers():
+    if not marker_store:
+        return jsonify({"error": "Marker store not ready"}), 503
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            markers = marker_store.upsert(data if isinstance(data, list) else [data])
+        except (AttributeError, TypeError, ValueError) as e:
+            return jsonify({"error": f"Invalid marker: {e}"}), 400
+        return jsonify(markers if isinstance(data, list) else markers[0])
+    bbox = request.args.get('bbox')
+    if not bbox:
+        return jsonify(marker_store.all())
+    try:
+        west, south, east, north = (float(v) for v in bbox.split(","))
+    except ValueError:
+        return jsonify({"error": "bbox must be west,south,east,north"}), 400
+    try:
+        return jsonify(marker_store.query(west, south, east, north, request.args.get('zoom', type=int, default=0)))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/api/markers/<marker_id>', methods=['DELETE'])
+def api_delete_marker(marker_id):
+    if not marker_store:
+        return jsonify({"error": "Marker store not ready"}), 503
+    return jsonify({"deleted": marker_store.delete(marker_id)})
+
+@app.route('/api/markers/stats')
+def api_marker_stats():
+    if not marker_store:
+        return jsonify({"error": "Marker store not ready"}), 503
+    return jsonify(marker_store.info())
+
+# Map tiles through the backend cache. The map switches to this layer when
+# /api/tiles/stats answers.
+@app.route('/tiles/<int:z>/<int:x>/<y>')
+def get_tile(z, x, y):
+    from tile_prefetch import CONTENT_TYPES
+
+    if not tile_service:
+        return jsonify({"error": "Tile service not ready"}), 503
+    try:
+        y = int(y.split(".")[0])
+    except ValueError:
+        return jsonify({"error": "Invalid tile"}), 400
+    tile = tile_service.get(z, x, y)
+    if not tile:
+        return jsonify({"error": "Tile not found"}), 404
+    ext, data = tile
+    return app.response_class(data, mimetype=CONTENT_TYPES.get(ext, "application/octet-stream"))
+
+# Cache hit rates, prefetch counters and I/O budget use.
+@app.route('/api/tiles/stats')
+def api_tile_stats():
+    if not tile_service:
+        return jsonify({"error": "Tile service not ready"}), 503
+    return jsonify(tile_service.info())
 
 # === Start Server ===
 def start_server():
-    socketio.run(app, port=1776)
+    socketio.run(app, port=SERVER_PORT)
 
 # === Webview Setup ===
 def launch_window():
+    import subprocess
+
     subprocess.Popen([
         "chromium-browser",
-        "--app=http://localhost:1776",
+        f"--app=http://localhost:{SERVER_PORT}",
         "--window-size=1024,768",
         "--noerrdialogs",
         "--disable-infobars",
@@ -169,41 +490,46 @@ def launch_window():
 
 # === Main Entry ===
 if __name__ == '__main__':
+    started_at = time.time()
     print("")
     print("=========================================")
     print(" Reaper Net - Serial Web Bridge v1.0")
     print("=========================================\n")
 
-    devices = auto_find_reaper_mesh_node()
-    if devices:
-        port, name = next(iter(devices.items()))
-        connected_reaper_node_port = port
-        connected_reaper_node_name = name
-        reaper_node_serial = serial.Serial(port, 115200, timeout=2)
-        reaper_node_connected = True
-        print(f"Connected to Reaper Node at {port} ({name})")
-        threading.Thread(target=serial_reader_thread, args=(reaper_node_serial,), daemon=True).start()
-    else:
-        print("No Reaper Mesh Node detected.")
+    geofences.load(os.path.join(app.root_path, GEOFENCE_CONFIG_PATH))
 
-    # Start Flask server in background
+    # Bind the HTTP server first so the UI loads while hardware initializes.
     threading.Thread(target=start_server, daemon=True).start()
+    if wait_for_port(SERVER_PORT):
+        print(f"[*] UI available at http://localhost:{SERVER_PORT} after {time.time() - started_at:.2f}s")
+    else:
+        print(f"[!] Server did not bind port {SERVER_PORT}")
 
-     # Start SBS1 listener in background
-    threading.Thread(target=sbs1_listener, daemon=True).start()
+    start_service("internet", monitor_internet)
+    start_service("aircraft_archive", start_aircraft_archive)
+    start_service("marker_store", start_marker_store)
+    start_service("tiles", start_tile_service)
+    start_service("reaper_nodes", start_reaper_nodes)
+    start_service("aircraft_feeds", start_aircraft_feeds)
+    start_service("aircraft_maintenance", aircraft_maintenance)
 
-    # Wait for the server to start
-    while not socketio.server:
-        time.sleep(0.1)
-    
     # Launch application window.
     #launch_window()
 
     # Development
-    webbrowser.open("http://localhost:1776")
+    if "--no-browser" not in sys.argv:
+        import webbrowser
+        webbrowser.open(f"http://localhost:{SERVER_PORT}")
 
     try:
         while True:
             time.sleep(1)
     except KeyboardInterrupt:
         print("Shutting down.")
+        aircraft_feeds.stop()
+        if tile_service:
+            tile_service.stop()
+        if reaper_nodes:
+            reaper_nodes.close()
+        if aircraft_archive:
+            aircraft_archive.close()
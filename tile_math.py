@@ -0,0 +1,233 @@
+import math
+
+# NumPy is only needed for the *_array functions and iter_tile_range, so it is
+# imported on first use; the scalar functions (and the server) never load it.
+np = None
+
+MAX_LATITUDE = 85.0511287798066
+
+def _require_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("numpy is required for vectorized tile math (pip install numpy)") from None
+        np = numpy
+
+# === Scalar ===
+# Slippy-map (XYZ) tile containing a point, clamped to the valid tile range.
+def deg2num(lat_deg, lon_deg, zoom):
+    lat_rad = math.radians(min(max(lat_deg, -MAX_LATITUDE), MAX_LATITUDE))
+    n = 2.0 ** zoom
+    x_tile = int((lon_deg + 180.0) / 360.0 * n)
+    y_tile = int((1.0 - math.log(math.tan(lat_rad) + 1 / math.cos(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x_tile, 0), int(n) - 1), min(max(y_tile, 0), int(n) - 1)
+
+# North-west corner of a tile.
+def num2deg(x, y, zoom):
+    n = 2.0 ** zoom
+    lon = x / n * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    return lat, lon
+
+# (lat_min, lon_min, lat_max, lon_max) of a tile.
+def tile_bounds(x, y, zoom):
+    lat_max, lon_min = num2deg(x, y, zoom)
+    lat_min, lon_max = num2deg(x + 1, y + 1, zoom)
+    return lat_min, lon_min, lat_max, lon_max
+
+def tile_parent(x, y, zoom):
+    return x >> 1, y >> 1, zoom - 1
+
+def tile_children(x, y, zoom):
+    x, y = x * 2, y * 2
+    return [(x, y, zoom + 1), (x + 1, y, zoom + 1), (x, y + 1, zoom + 1), (x + 1, y + 1, zoom + 1)]
+
+# Bing Maps quadkey: one base-4 digit per zoom level, most significant first.
+def tile_to_quadkey(x, y, zoom):
+    digits = []
+    for i in range(zoom, 0, -1):
+        mask = 1 << (i - 1)
+        digits.append(str((1 if x & mask else 0) + (2 if y & mask else 0)))
+    return "".join(digits)
+
+def quadkey_to_tile(quadkey):
+    x = y = 0
+    zoom = len(quadkey)
+    for i, digit in enumerate(quadkey):
+        mask = 1 << (zoom - 1 - i)
+        if digit not in "0123":
+            raise ValueError(f"Invalid quadkey digit: {digit}")
+        value = int(digit)
+        if value & 1:
+            x |= mask
+        if value & 2:
+            y |= mask
+    return x, y, zoom
+
+# x0, x1, y0, y1 (inclusive) of the tiles covering a bbox.
+def tile_range(lat_min, lon_min, lat_max, lon_max, zoom):
+    x0, y0 = deg2num(lat_max, lon_min, zoom)
+    x1, y1 = deg2num(lat_min, lon_max, zoom)
+    return x0, x1, y0, y1
+
+def tile_count(lat_min, lon_min, lat_max, lon_max, zooms):
+    total = 0
+    for z in zooms:
+        x0, x1, y0, y1 = tile_range(lat_min, lon_min, lat_max, lon_max, z)
+        total += (x1 - x0 + 1) * (y1 - y0 + 1)
+    return total
+
+# === Vectorized (NumPy) ===
+# Same formulas as the scalar versions, applied to whole arrays at once.
+def deg2num_array(lats, lons, zoom):
+    _require_numpy()
+    lat_rad = np.radians(np.clip(np.asarray(lats, dtype=np.float64), -MAX_LATITUDE, MAX_LATITUDE))
+    lons = np.asarray(lons, dtype=np.float64)
+    n = 2.0 ** zoom
+    xs = ((lons + 180.0) / 360.0 * n).astype(np.int64)
+    ys = ((1.0 - np.log(np.tan(lat_rad) + 1 / np.cos(lat_rad)) / np.pi) / 2.0 * n).astype(np.int64)
+    limit = int(n) - 1
+    return np.clip(xs, 0, limit), np.clip(ys, 0, limit)
+
+def num2deg_array(xs, ys, zoom):
+    _require_numpy()
+    n = 2.0 ** zoom
+    lons = np.asarray(xs, dtype=np.float64) / n * 360.0 - 180.0
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * np.asarray(ys, dtype=np.float64) / n))))
+    return lats, lons
+
+def tile_bounds_array(xs, ys, zoom):
+    _require_numpy()
+    xs, ys = np.asarray(xs), np.asarray(ys)
+    lat_max, lon_min = num2deg_array(xs, ys, zoom)
+    lat_min, lon_max = num2deg_array(xs + 1, ys + 1, zoom)
+    return lat_min, lon_min, lat_max, lon_max
+
+def tile_parent_array(xs, ys, levels=1):
+    _require_numpy()
+    return np.asarray(xs) >> levels, np.asarray(ys) >> levels
+
+# Children in the same order as tile_children, four per input tile.
+def tile_children_array(xs, ys):
+    _require_numpy()
+    xs, ys = np.asarray(xs) * 2, np.asarray(ys) * 2
+    child_xs = np.stack([xs, xs + 1, xs, xs + 1], axis=-1).ravel()
+    child_ys = np.stack([ys, ys, ys + 1, ys + 1], axis=-1).ravel()
+    return child_xs, child_ys
+
+# Fixed-width byte strings (dtype S<zoom>), built one digit column at a time.
+def quadkey_array(xs, ys, zoom):
+    _require_numpy()
+    xs, ys = np.asarray(xs, dtype=np.int64), np.asarray(ys, dtype=np.int64)
+    if zoom == 0:
+        return np.zeros(xs.shape, dtype="S1")
+    digits = np.empty(xs.shape + (zoom,), dtype=np.uint8)
+    for i in range(zoom):
+        shift = zoom - 1 - i
+        digits[..., i] = ord("0") + ((xs >> shift) & 1) + 2 * ((ys >> shift) & 1)
+    return digits.view(f"S{zoom}")[..., 0]
+
+# Quadkeys of one zoom level (str or bytes). Returns xs, ys, zoom.
+def quadkey_array_to_tiles(quadkeys):
+    _require_numpy()
+    keys = np.asarray(quadkeys, dtype="S")
+    if (keys == b"").all():
+        return np.zeros(keys.shape, dtype=np.int64), np.zeros(keys.shape, dtype=np.int64), 0
+    zoom = keys.dtype.itemsize
+    digits = keys.view(np.uint8).reshape(keys.shape + (zoom,)).astype(np.int64) - ord("0")
+    if ((digits < 0) | (digits > 3)).any():
+        raise ValueError("Invalid quadkey digit, or quadkeys of mixed zoom")
+    weights = 1 << np.arange(zoom - 1, -1, -1, dtype=np.int64)
+    return (digits & 1) @ weights, (digits >> 1) @ weights, zoom
+
+# Every tile covering a bbox at each zoom, as (z, xs, ys) uint32 chunks in
+# x-major order, so million-tile regions never become lists of tuples.
+def iter_tile_range(lat_min, lon_min, lat_max, lon_max, zooms, chunk_size=1 << 16):
+    _require_numpy()
+    for z in zooms:
+        x0, x1, y0, y1 = tile_range(lat_min, lon_min, lat_max, lon_max, z)
+        rows = y1 - y0 + 1
+        total = (x1 - x0 + 1) * rows
+        for start in range(0, total, chunk_size):
+            index = np.arange(start, min(start + chunk_size, total), dtype=np.int64)
+            yield z, (x0 + index // rows).astype(np.uint32), (y0 + index % rows).astype(np.uint32)
+
+# === Benchmark ===
+def benchmark(points=500000, seed=7):
+    import time
+
+    _require_numpy()
+    rng = np.random.default_rng(seed)
+    lats = rng.uniform(-85.0, 85.0, points)
+    lons = rng.uniform(-180.0, 180.0, points)
+
+    print("Correctness (vectorized vs scalar):")
+    for zoom in (0, 5, 12, 18, 24):
+        xs, ys = deg2num_array(lats, lons, zoom)
+        mismatches = sum((int(xs[i]), int(ys[i])) != deg2num(lats[i], lons[i], zoom) for i in range(points))
+        # Exact tile corners are where rounding differences would show up.
+        tx = rng.integers(0, 1 << zoom, 20000)
+        ty = rng.integers(0, 1 << zoom, 20000)
+        corner_lats, corner_lons = num2deg_array(tx, ty, zoom)
+        cx, cy = deg2num_array(corner_lats, corner_lons, zoom)
+        corner_mismatches = sum((int(cx[i]), int(cy[i])) != deg2num(corner_lats[i], corner_lons[i], zoom) for i in range(len(tx)))
+        keys = quadkey_array(xs, ys, zoom)
+        qx, qy, _ = quadkey_array_to_tiles(keys)
+        quadkeys_ok = all(keys[i].decode() == tile_to_quadkey(int(xs[i]), int(ys[i]), zoom) for i in range(0, points, 97))
+        print(f"  z{zoom:<2} deg2num mismatches {mismatches}/{points}  tile corners {corner_mismatches}/{len(tx)}  "
+              f"quadkeys match scalar: {quadkeys_ok}  round trip: {bool((qx == xs).all() and (qy == ys).all())}")
+
+    print("Throughput:")
+    zoom = 16
+    start = time.perf_counter()
+    for lat, lon in zip(lats.tolist(), lons.tolist()):
+        deg2num(lat, lon, zoom)
+    scalar = time.perf_counter() - start
+    start = time.perf_counter()
+    deg2num_array(lats, lons, zoom)
+    vector = time.perf_counter() - start
+    print(f"  deg2num      scalar {points / scalar / 1e6:6.2f} M points/s   vectorized {points / vector / 1e6:7.2f} M points/s   ({scalar / vector:.0f}x)")
+
+    xs, ys = deg2num_array(lats, lons, zoom)
+    xs_list, ys_list = xs.tolist(), ys.tolist()
+    start = time.perf_counter()
+    for x, y in zip(xs_list, ys_list):
+        tile_to_quadkey(x, y, zoom)
+    scalar = time.perf_counter() - start
+    start = time.perf_counter()
+    quadkey_array(xs, ys, zoom)
+    vector = time.perf_counter() - start
+    print(f"  quadkey      scalar {points / scalar / 1e6:6.2f} M tiles/s    vectorized {points / vector / 1e6:7.2f} M tiles/s    ({scalar / vector:.0f}x)")
+
+    start = time.perf_counter()
+    for x, y in zip(xs_list, ys_list):
+        tile_bounds(x, y, zoom)
+    scalar = time.perf_counter() - start
+    start = time.perf_counter()
+    tile_bounds_array(xs, ys, zoom)
+    vector = time.perf_counter() - start
+    print(f"  tile_bounds  scalar {points / scalar / 1e6:6.2f} M tiles/s    vectorized {points / vector / 1e6:7.2f} M tiles/s    ({scalar / vector:.0f}x)")
+
+    # Coverage planning: every tile over the continental US at z11-14.
+    bbox, zooms = (24.396308, -125.0, 49.384358, -66.93457), range(11, 15)
+    total = tile_count(*bbox, zooms)
+    start = time.perf_counter()
+    tuples = []
+    for z in zooms:
+        x0, y0 = deg2num(bbox[2], bbox[1], z)
+        x1, y1 = deg2num(bbox[0], bbox[3], z)
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                tuples.append((z, x, y))
+    scalar = time.perf_counter() - start
+    del tuples
+    start = time.perf_counter()
+    counted = sum(len(xs) for _, xs, _ in iter_tile_range(*bbox, zooms))
+    vector = time.perf_counter() - start
+    assert counted == total
+    print(f"  tile range   tuples {total / scalar / 1e6:6.2f} M tiles/s    arrays     {total / vector / 1e6:7.2f} M tiles/s    ({scalar / vector:.0f}x, {total:,} tiles)")
+
+if __name__ == '__main__':
+    benchmark()
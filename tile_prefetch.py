@@ -0,0 +1,461 @@
+import os
+import math
+import time
+import heapq
+import sqlite3
+import threading
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+
+from aircraft_tracks import dead_reckon
+from region_pack import TILE_EXTENSIONS
+from tile_math import deg2num
+
+TILE_CACHE_BYTES = 64 * 1024 * 1024
+TILE_DEFAULT_ZOOM = 15
+TILE_DOWNLOAD_TIMEOUT = 10
+TILE_USER_AGENT = "ReaperNet/1.0 (tile cache)"
+
+# How far ahead of the vehicle to warm, and how wide a corridor (in tiles).
+PREFETCH_HORIZON_SECONDS = 120
+PREFETCH_CORRIDOR_TILES = 2
+# Tiles at zoom +-1 wait behind current-zoom tiles this many seconds further ahead.
+PREFETCH_ZOOM_PENALTY_SECONDS = 30
+PREFETCH_MAX_SAMPLES = 48
+PREFETCH_MAX_TILES = 256
+PREFETCH_MIN_SPEED_KMH = 2.0
+# I/O budget shared with on-demand fills; prefetch only spends what is left.
+PREFETCH_TILES_PER_SEC = 10
+PREFETCH_BYTES_PER_SEC = 1024 * 1024
+# A tile nobody has is not asked for again for this long.
+MISSING_TILE_RETRY_SECONDS = 600
+
+EARTH_CIRCUMFERENCE_M = 40075016.686
+KMH_TO_KNOTS = 1 / 1.852
+
+CONTENT_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".webp": "image/webp",
+    ".pbf": "application/x-protobuf",
+}
+
+# === Tile Sources ===
+# get(z, x, y) returns (ext, data) or None when the source has no such tile.
+class DirectoryTileSource:
+    def __init__(self, root):
+        self.name = "directory"
+        self.root = root
+
+    def get(self, z, x, y):
+        column = os.path.join(self.root, str(z), str(x))
+        for ext in TILE_EXTENSIONS:
+            try:
+                with open(os.path.join(column, f"{y}{ext}"), "rb") as f:
+                    return ext, f.read()
+            except FileNotFoundError:
+                continue
+        return None
+
+    def put(self, z, x, y, ext, data):
+        column = os.path.join(self.root, str(z), str(x))
+        os.makedirs(column, exist_ok=True)
+        path = os.path.join(column, f"{y}{ext}")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+# MBTiles rows are TMS (y flipped).
+class MBTilesTileSource:
+    def __init__(self, path):
+        self.name = "mbtiles"
+        self.path = path
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        row = self._conn.execute("SELECT value FROM metadata WHERE name = 'format'").fetchone()
+        self.ext = "." + (row[0] if row else "png")
+        self._lock = threading.Lock()
+
+    def get(self, z, x, y):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                (z, x, (1 << z) - 1 - y)
+            ).fetchone()
+        return (self.ext, bytes(row[0])) if row else None
+
+class HTTPTileSource:
+    def __init__(self, url_template, timeout=TILE_DOWNLOAD_TIMEOUT):
+        self.name = "download"
+        self.url_template = url_template
+        self.timeout = timeout
+
+    def get(self, z, x, y):
+        url = self.url_template.format(z=z, x=x, y=y, s="a", r="")
+        request = urllib.request.Request(url, headers={"User-Agent": TILE_USER_AGENT})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as res:
+                data = res.read()
+                content_type = res.headers.get_content_type()
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return None
+            raise
+        ext = next((e for e, t in CONTENT_TYPES.items() if t == content_type), os.path.splitext(url)[1] or ".png")
+        return ext, data
+
+def open_tile_store(path):
+    if path.endswith(".mbtiles"):
+        return MBTilesTileSource(path) if os.path.exists(path) else None
+    return DirectoryTileSource(path)
+
+# === Memory Cache ===
+# LRU bounded by bytes. Entries remember whether prefetch put them there, so
+# hits can be credited to the prefetcher and unused prefetches counted.
+class TileCache:
+    def __init__(self, max_bytes=TILE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.entries = OrderedDict()
+        self.evicted_unused = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            self.entries.move_to_end(key)
+            ext, data, prefetched = entry
+            if prefetched:
+                self.entries[key] = (ext, data, False)
+            return ext, data, prefetched
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def put(self, key, ext, data, prefetched=False):
+        with self._lock:
+            old = self.entries.pop(key, None)
+            if old:
+                self.bytes -= len(old[1])
+            self.entries[key] = (ext, data, prefetched)
+            self.bytes += len(data)
+            while self.bytes > self.max_bytes and self.entries:
+                _, (_, old_data, unused) = self.entries.popitem(last=False)
+                self.bytes -= len(old_data)
+                self.evicted_unused += unused
+
+# === I/O Budget ===
+# Token buckets for tile fetches and bytes. On-demand fills spend without
+# waiting, which pushes the prefetcher back while the map is loading.
+class IOBudget:
+    def __init__(self, tiles_per_sec=PREFETCH_TILES_PER_SEC, bytes_per_sec=PREFETCH_BYTES_PER_SEC):
+        self.tiles_per_sec = tiles_per_sec
+        self.bytes_per_sec = bytes_per_sec
+        self.tiles = float(tiles_per_sec)
+        self.byte_tokens = float(bytes_per_sec)
+        self.throttled_seconds = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self.tiles = min(self.tiles + elapsed * self.tiles_per_sec, self.tiles_per_sec)
+        self.byte_tokens = min(self.byte_tokens + elapsed * self.bytes_per_sec, self.bytes_per_sec)
+
+    def spend(self, nbytes, tiles=0):
+        with self._lock:
+            self._refill()
+            self.byte_tokens -= nbytes
+            self.tiles -= tiles
+
+    # Blocks until one tile fetch is allowed; False if stopped while waiting.
+    def acquire(self, stop):
+        while not stop.is_set():
+            with self._lock:
+                self._refill()
+                if self.tiles >= 1 and self.byte_tokens > 0:
+                    self.tiles -= 1
+                    return True
+                wait = max((1 - self.tiles) / self.tiles_per_sec, -self.byte_tokens / self.bytes_per_sec, 0.01)
+            self.throttled_seconds += wait
+            stop.wait(wait)
+        return False
+
+# === Look-Ahead Plan ===
+# Tiles along the projected path at zoom-1..zoom+1, ordered by when the vehicle
+# reaches them, current zoom first. Returns [(priority, eta, z, x, y)].
+def plan_tiles(lat, lon, speed_kmh, heading, zoom, horizon=PREFETCH_HORIZON_SECONDS,
+               corridor=PREFETCH_CORRIDOR_TILES, max_tiles=PREFETCH_MAX_TILES):
+    samples = [0.0]
+    moving = speed_kmh is not None and heading is not None and speed_kmh >= PREFETCH_MIN_SPEED_KMH
+    if moving:
+        # Step half a tile of the finest zoom, capped to a fixed sample count.
+        tile_m = EARTH_CIRCUMFERENCE_M * math.cos(math.radians(lat)) / (1 << (zoom + 1))
+        step = max(tile_m / 2 / (speed_kmh / 3.6), horizon / PREFETCH_MAX_SAMPLES)
+        samples = [i * step for i in range(int(horizon / step) + 1)]
+
+    best = {}
+    for t in samples:
+        if t:
+            p_lat, p_lon, _ = dead_reckon(lat, lon, math.nan, speed_kmh * KMH_TO_KNOTS, heading, math.nan, t)
+        else:
+            p_lat, p_lon = lat, lon
+        for z in (zoom, zoom - 1, zoom + 1):
+            if z < 0:
+                continue
+            n = 1 << z
+            tx, ty = deg2num(p_lat, p_lon, z)
+            for dy in range(-corridor, corridor + 1):
+                y = ty + dy
+                if y < 0 or y >= n:
+                    continue
+                for dx in range(-corridor, corridor + 1):
+                    key = (z, (tx + dx) % n, y)
+                    if key not in best:
+                        best[key] = t
+    plan = sorted((eta + abs(z - zoom) * PREFETCH_ZOOM_PENALTY_SECONDS, eta, z, x, y) for (z, x, y), eta in best.items())
+    return plan[:max_tiles]
+
+# === Tile Service ===
+# Serves map tiles from memory, then the local store, then the download source,
+# and prefetches ahead of the vehicle from GPS fixes.
+class TileService:
+    def __init__(self, store=None, download=None, cache_bytes=TILE_CACHE_BYTES,
+                 tiles_per_sec=PREFETCH_TILES_PER_SEC, bytes_per_sec=PREFETCH_BYTES_PER_SEC,
+                 save_downloads=False, default_zoom=TILE_DEFAULT_ZOOM):
+        self.store = store
+        self.download = download
+        self.save_downloads = save_downloads and isinstance(store, DirectoryTileSource)
+        self.cache = TileCache(cache_bytes)
+        self.budget = IOBudget(tiles_per_sec, bytes_per_sec)
+        self.zoom = default_zoom
+        self.position = None
+        self.missing = {}
+        self.queue = []
+        self.stats = {
+            "requests": 0,
+            "memory_hits": 0,
+            "prefetch_hits": 0,
+            "store_fills": 0,
+            "download_fills": 0,
+            "not_found": 0,
+            "errors": 0,
+            "plans": 0,
+            "prefetch_queued": 0,
+            "prefetch_superseded": 0,
+            "prefetch_skipped": 0,
+            "prefetch_store": 0,
+            "prefetch_download": 0,
+            "prefetch_not_found": 0,
+            "prefetch_bytes": 0,
+            "fill_bytes": 0,
+        }
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._worker = threading.Thread(target=self._prefetch_loop, daemon=True)
+
+    def start(self):
+        self._worker.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    # Local store first. Downloads are only written back to a directory store
+    # when save_downloads is set: nothing ever trims that directory.
+    def _fetch(self, z, x, y):
+        if self.store:
+            tile = self.store.get(z, x, y)
+            if tile:
+                return tile, "store"
+        if self.download:
+            tile = self.download.get(z, x, y)
+            if tile:
+                if self.save_downloads:
+                    self.store.put(z, x, y, *tile)
+                return tile, "download"
+        return None, None
+
+    def _known_missing(self, key, now):
+        missed = self.missing.get(key)
+        return missed is not None and now - missed < MISSING_TILE_RETRY_SECONDS
+
+    def _mark_missing(self, key, now):
+        if len(self.missing) > 10000:
+            self.missing = {k: t for k, t in self.missing.items() if now - t < MISSING_TILE_RETRY_SECONDS}
+        self.missing[key] = now
+
+    # On-demand tile for the map. Returns (ext, data) or None.
+    def get(self, z, x, y):
+        key = (z, x, y)
+        self.zoom = z
+        self.stats["requests"] += 1
+        cached = self.cache.get(key)
+        if cached:
+            ext, data, prefetched = cached
+            self.stats["memory_hits"] += 1
+            self.stats["prefetch_hits"] += prefetched
+            return ext, data
+        now = time.time()
+        if self._known_missing(key, now):
+            self.stats["not_found"] += 1
+            return None
+        try:
+            tile, origin = self._fetch(z, x, y)
+        except Exception as e:
+            print(f"[!] Tile {z}/{x}/{y} fetch failed: {e}")
+            self.stats["errors"] += 1
+            return None
+        if not tile:
+            self._mark_missing(key, now)
+            self.stats["not_found"] += 1
+            return None
+        self.stats[f"{origin}_fills"] += 1
+        self.stats["fill_bytes"] += len(tile[1])
+        self.budget.spend(len(tile[1]), tiles=1)
+        self.cache.put(key, *tile)
+        return tile
+
+    # New GPS fix (speed in km/h, heading in degrees). The new plan replaces
+    # whatever was still queued from the previous fix.
+    def update_position(self, lat, lon, speed_kmh=None, heading=None, ts=None):
+        self.position = {"latitude": lat, "longitude": lon, "speed": speed_kmh, "heading": heading,
+                         "timestamp": time.time() if ts is None else ts}
+        now = time.time()
+        plan = [item for item in plan_tiles(lat, lon, speed_kmh, heading, self.zoom)
+                if item[2:] not in self.cache and not self._known_missing(item[2:], now)]
+        with self._cond:
+            self.stats["plans"] += 1
+            self.stats["prefetch_superseded"] += len(self.queue)
+            self.stats["prefetch_queued"] += len(plan)
+            self.queue = plan
+            heapq.heapify(self.queue)
+            self._cond.notify()
+
+    def _prefetch_loop(self):
+        while not self._stop.is_set():
+            with self._cond:
+                while not self.queue and not self._stop.is_set():
+                    self._cond.wait()
+                if self._stop.is_set():
+                    return
+                key = heapq.heappop(self.queue)[2:]
+            now = time.time()
+            if key in self.cache or self._known_missing(key, now):
+                self.stats["prefetch_skipped"] += 1
+                continue
+            if not self.budget.acquire(self._stop):
+                return
+            try:
+                tile, origin = self._fetch(*key)
+            except Exception as e:
+                print(f"[!] Tile prefetch {key} failed: {e}")
+                self.stats["errors"] += 1
+                continue
+            if not tile:
+                self._mark_missing(key, now)
+                self.stats["prefetch_not_found"] += 1
+                continue
+            self.budget.spend(len(tile[1]))
+            self.stats[f"prefetch_{origin}"] += 1
+            self.stats["prefetch_bytes"] += len(tile[1])
+            if key not in self.cache:
+                self.cache.put(key, *tile, prefetched=True)
+
+    def info(self):
+        stats = dict(self.stats)
+        requests = stats["requests"]
+        fetched = stats["prefetch_store"] + stats["prefetch_download"]
+        return {
+            **stats,
+            "hit_rate": round(stats["memory_hits"] / requests, 4) if requests else None,
+            "prefetch_hit_rate": round(stats["prefetch_hits"] / requests, 4) if requests else None,
+            "prefetch_used": round(stats["prefetch_hits"] / fetched, 4) if fetched else None,
+            "prefetch_evicted_unused": self.cache.evicted_unused,
+            "prefetch_pending": len(self.queue),
+            "throttled_seconds": round(self.budget.throttled_seconds, 2),
+            "cache_entries": len(self.cache.entries),
+            "cache_bytes": self.cache.bytes,
+            "cache_max_bytes": self.cache.max_bytes,
+            "zoom": self.zoom,
+            "position": self.position,
+            "store": self.store.name if self.store else None,
+            "download": self.download.url_template if self.download else None,
+        }
+
+# === Simulation ===
+# Drives a vehicle across a stand-in tile server and compares the memory hit
+# rate of the map's tile requests with and without prefetch.
+class FakeTileServer:
+    def __init__(self, port, latency=0.05, host="127.0.0.1"):
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(server.latency)
+                server.requests += 1
+                body = f"tile {self.path}".encode() * 200
+                self.send_response(200)
+                self.send_header("Content-Type", "image/png")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.latency = latency
+        self.requests = 0
+        self.url = f"http://{host}:{port}/{{z}}/{{x}}/{{y}}.png"
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.httpd.shutdown()
+
+def _viewport(lat, lon, zoom, half_width=2, half_height=1):
+    tx, ty = deg2num(lat, lon, zoom)
+    return [(zoom, tx + dx, ty + dy) for dy in range(-half_height, half_height + 1)
+            for dx in range(-half_width, half_width + 1)]
+
+def simulate(prefetch, server, fixes=60, fix_interval=5.0, speed_kmh=120.0, heading=60.0, zoom=16, time_scale=10):
+    service = TileService(download=HTTPTileSource(server.url), tiles_per_sec=40, bytes_per_sec=4 * 1024 * 1024)
+    service.zoom = zoom
+    service.start()
+    lat, lon = 35.0, -100.0
+    waits = []
+    for _ in range(fixes):
+        # GPS fixes every fix_interval seconds, replayed time_scale times faster.
+        lat, lon, _ = dead_reckon(lat, lon, math.nan, speed_kmh * KMH_TO_KNOTS, heading, math.nan, fix_interval)
+        if prefetch:
+            service.update_position(lat, lon, speed_kmh, heading)
+        time.sleep(fix_interval / time_scale)
+        for key in _viewport(lat, lon, zoom):
+            start = time.perf_counter()
+            service.get(*key)
+            waits.append(time.perf_counter() - start)
+    service.stop()
+    return service.info(), sum(waits) / len(waits), max(waits)
+
+def benchmark():
+    server = FakeTileServer(40180, latency=0.05)
+    for prefetch in (False, True):
+        info, mean_wait, max_wait = simulate(prefetch, server)
+        misses = info["requests"] - info["memory_hits"]
+        print(f"prefetch={'on ' if prefetch else 'off'} requests={info['requests']} misses={misses:3} "
+              f"hit_rate={info['hit_rate']:.1%} tile wait mean={mean_wait * 1000:5.1f} ms max={max_wait * 1000:5.1f} ms "
+              f"prefetched={info['prefetch_download']} used={info['prefetch_used'] or 0:.0%} "
+              f"throttled={info['throttled_seconds']}s")
+    server.stop()
+
+if __name__ == '__main__':
+    benchmark()